@@ -6,21 +6,114 @@ This script reads the large index.json file and creates an LMDB database
 for efficient article location queries.
 """
 
-import json
 import os
 import sys
+from itertools import islice
 
+import ijson
 import lmdb
+import orjson
+import zstandard
 from tqdm import tqdm
 
+# Must match LOCATION_SEP and CASEFOLD_DB in src/wiki_db.py
+LOCATION_SEP = b"\x1f"
+CASEFOLD_DB = b"__casefold__"
 
-def convert_json_to_lmdb(json_path: str, lmdb_path: str, map_size: int = 1024 * 1024 * 1024):
+# Pairs written per putmulti call when streaming a plain index
+STREAM_BATCH_SIZE = 100_000
+
+# Embedded pages make the index roughly as large as the pruned dump itself
+EMBEDDED_MAP_SIZE = 64 * 1024 * 1024 * 1024
+
+
+def add_line_offsets(entries: dict[bytes, bytes], base_dir: str):
+    """Append the byte offset and length of each article's JSONL line to its location, in place.
+
+    Locations are resolved relative to `base_dir`. Articles whose line can't be found keep the
+    bare location, which WikiData handles by scanning the whole file.
+    """
+    locations = set(entries.values())
+    for location in tqdm(locations, desc="Indexing offsets"):
+        path = os.path.join(base_dir, location.decode("utf-8"))
+        if not os.path.exists(path):
+            print(f"Warning: {path} does not exist, skipping offsets for it")
+            continue
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                # Blank lines are skipped (as WikiData does) but still count towards the offset
+                if line.strip():
+                    title = orjson.loads(line)["title"].encode("utf-8")
+                    if entries.get(title) == location:
+                        entries[title] = b"%s%s%d%s%d" % (
+                            location, LOCATION_SEP, offset, LOCATION_SEP, len(line)
+                        )
+                offset += len(line)
+
+
+def add_embedded_pages(entries: dict[bytes, bytes], base_dir: str, level: int = 3):
+    """Append each article's zstd-compressed page (title, url, text, links) to its location, in
+    place, so WikiData can serve it from the index without reading the JSONL file.
+
+    Locations are resolved relative to `base_dir`. Articles whose line can't be found, or that
+    have no parsed links yet, keep the bare location.
+    """
+    compressor = zstandard.ZstdCompressor(level=level)
+    locations = set(entries.values())
+    for location in tqdm(locations, desc="Embedding pages"):
+        path = os.path.join(base_dir, location.decode("utf-8"))
+        if not os.path.exists(path):
+            print(f"Warning: {path} does not exist, skipping pages in it")
+            continue
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                title = record["title"].encode("utf-8")
+                if entries.get(title) != location or "links" not in record:
+                    continue
+                page = {key: record.get(key) for key in ("title", "url", "text", "links")}
+                entries[title] = location + LOCATION_SEP + compressor.compress(orjson.dumps(page))
+
+
+def build_casefold_entries(titles) -> dict[bytes, bytes]:
+    """Map each lowercased title to the title it should resolve to.
+
+    When several titles differ only in case, the capitalized form (the usual Wikipedia spelling)
+    wins, then the first in sorted order.
+    """
+    casefold: dict[bytes, bytes] = {}
+    for title in sorted(titles):
+        lowered = title.decode("utf-8").lower()
+        key = lowered.encode("utf-8")
+        capitalized = (lowered[:1].upper() + lowered[1:]).encode("utf-8")
+        if key not in casefold or title == capitalized:
+            casefold[key] = title
+    return casefold
+
+
+def convert_json_to_lmdb(
+    json_path: str,
+    lmdb_path: str,
+    map_size: int = 1024 * 1024 * 1024,
+    with_offsets: bool = False,
+    embed_pages: bool = False,
+    with_casefold: bool = False,
+):
     """Convert index.json to an LMDB database.
 
     Args:
         json_path: Path to the index.json file
         lmdb_path: Path where the LMDB database should be created
         map_size: Maximum size of the LMDB database in bytes (default 1GB)
+        with_offsets: Also store each article's byte span within its JSONL file, so lookups read
+            a single line. Locations are resolved relative to the directory of `json_path`.
+        embed_pages: Store each article's compressed page in the index itself, so lookups don't
+            read the JSONL files at all. Takes precedence over `with_offsets`.
+        with_casefold: Also write the lowercased title -> title sub-database, so WikiData resolves
+            case variations with one probe instead of trying each variation in turn.
     """
     if not os.path.exists(json_path):
         print(f"Error: {json_path} does not exist")
@@ -36,67 +129,87 @@ def convert_json_to_lmdb(json_path: str, lmdb_path: str, map_size: int = 1024 *
     print(f"Converting {json_path} to {lmdb_path}...")
     print(f"LMDB map size: {map_size / (1024*1024*1024):.1f} GB")
 
-    # Open LMDB environment
-    env = lmdb.open(lmdb_path, map_size=map_size)
+    # Open LMDB environment. This is a one-shot offline build, so skip per-commit fsyncs; the data
+    # is flushed once after the load. writemap isn't used, since it grows data.mdb to the full
+    # map_size and that file is uploaded and downloaded whole.
+    env = lmdb.open(
+        lmdb_path,
+        map_size=map_size,
+        max_dbs=2,
+        sync=False,
+        metasync=False,
+    )
 
     try:
         # Get file size for progress tracking
         file_size = os.path.getsize(json_path)
         print(f"Index file size: {file_size / (1024*1024):.1f} MB")
 
-        with open(json_path, "r", encoding="utf-8") as f:
-            # Load the JSON data
-            print("Loading JSON data...")
-            data = json.load(f)
-
-            if not isinstance(data, dict):
-                print(
-                    "Error: JSON file should contain a dictionary mapping article names to locations"
-                )
-                sys.exit(1)
-
-            print(f"Found {len(data)} articles in index")
-
-            # Write to LMDB in batches for better performance
-            batch_size = 10000
-            txn = env.begin(write=True)
-            try:
-                for i, (article, location) in enumerate(tqdm(data.items(), desc="Converting")):
-                    # Encode both key and value as UTF-8 bytes
-                    key = article.encode("utf-8")
-                    value = location.encode("utf-8")
-
-                    txn.put(key, value)
-
-                    # Commit batch periodically
-                    if (i + 1) % batch_size == 0:
-                        txn.commit()
-                        txn = env.begin(write=True)
-
-                # Commit any remaining items
-                txn.commit()
-            except Exception as e:
-                txn.abort()
-                raise e
+        with open(json_path, "rb") as f:
+            # Stream article -> location pairs instead of loading the whole dict into memory.
+            # ijson raises if the root is not an object.
+            print("Streaming JSON data...")
+            pairs = (
+                (article.encode("utf-8"), location.encode("utf-8"))
+                for article, location in tqdm(ijson.kvitems(f, ""), desc="Reading")
+            )
+
+            if not (embed_pages or with_offsets or with_casefold):
+                # Nothing else needs the whole map, so pairs are written in batches as they are
+                # read and peak memory doesn't grow with the index. Unsorted keys can't use the
+                # MDB_APPEND fast path, but the writes all go through one transaction.
+                with env.begin(write=True) as txn:
+                    cursor = txn.cursor()
+                    added = 0
+                    while batch := list(islice(pairs, STREAM_BATCH_SIZE)):
+                        added += cursor.putmulti(batch)[1]
+                    print(f"Wrote {added} entries")
+            else:
+                # Offsets, embedded pages and the casefold map need every title at once, so the
+                # encoded pairs are kept in memory and written sorted
+                entries = dict(pairs)
+                print(f"Found {len(entries)} articles in index")
+
+                base_dir = os.path.dirname(os.path.abspath(json_path))
+                if embed_pages:
+                    add_embedded_pages(entries, base_dir)
+                elif with_offsets:
+                    add_line_offsets(entries, base_dir)
+
+                # Write all entries in a single transaction. Keys are sorted so LMDB can use the
+                # MDB_APPEND fast path and fill pages sequentially instead of searching the B+tree.
+                with env.begin(write=True) as txn:
+                    _, added = txn.cursor().putmulti(sorted(entries.items()), append=True)
+                    print(f"Wrote {added} entries")
+
+                    if with_casefold:
+                        casefold_db = env.open_db(CASEFOLD_DB, txn=txn)
+                        casefold = build_casefold_entries(entries)
+                        _, added = txn.cursor(db=casefold_db).putmulti(
+                            sorted(casefold.items()), append=True
+                        )
+                        print(f"Wrote {added} casefold entries")
+
+            # Flush to disk once now that the load is complete
+            env.sync(True)
 
         print(f"Successfully created LMDB database at {lmdb_path}")
 
-        # Verify the database
+        # Verify the database using the entry count LMDB already tracks
         print("Verifying database...")
         with env.begin() as txn:
-            cursor = txn.cursor()
-            count = sum(1 for _ in cursor)
-            print(f"Database contains {count} entries")
-
-        # Show some sample entries
-        print("\nSample entries:")
-        with env.begin() as txn:
-            cursor = txn.cursor()
-            for i, (key, value) in enumerate(cursor):
-                if i >= 5:  # Show first 5 entries
-                    break
+            entries = txn.stat()["entries"]
+            if txn.get(CASEFOLD_DB) is not None:
+                # The casefold sub-database's record lives in the main DB but isn't an article
+                entries -= 1
+            print(f"Database contains {entries} entries")
+
+            # Show some sample entries
+            print("\nSample entries:")
+            samples = ((key, value) for key, value in txn.cursor() if key != CASEFOLD_DB)
+            for key, value in islice(samples, 5):
                 article = key.decode("utf-8")
-                location = value.decode("utf-8")
+                location = value.split(LOCATION_SEP, 1)[0].decode("utf-8")
                 print(f"  {article} -> {location}")
 
     except Exception as e:
@@ -113,17 +226,29 @@ def main():
     lmdb_path = "index.lmdb"
 
     # Allow command line arguments
-    if len(sys.argv) >= 2:
-        json_path = sys.argv[1]
-    if len(sys.argv) >= 3:
-        lmdb_path = sys.argv[2]
+    with_offsets = "--with-offsets" in sys.argv
+    embed_pages = "--embed-pages" in sys.argv
+    with_casefold = "--with-casefold" in sys.argv
+    flags = ("--with-offsets", "--embed-pages", "--with-casefold")
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+    if len(args) >= 1:
+        json_path = args[0]
+    if len(args) >= 2:
+        lmdb_path = args[1]
 
     # Check for notebooks/index.json as fallback
     if not os.path.exists(json_path) and os.path.exists("notebooks/index.json"):
         json_path = "notebooks/index.json"
         print(f"Using {json_path}")
 
-    convert_json_to_lmdb(json_path, lmdb_path)
+    convert_json_to_lmdb(
+        json_path,
+        lmdb_path,
+        map_size=EMBEDDED_MAP_SIZE if embed_pages else 1024 * 1024 * 1024,
+        with_offsets=with_offsets,
+        embed_pages=embed_pages,
+        with_casefold=with_casefold,
+    )
 
 
 if __name__ == "__main__":
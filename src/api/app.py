@@ -1,28 +1,31 @@
-import json
 from uuid import uuid4
 
 import modal
-from dotenv import load_dotenv
-from flask import Flask
+import orjson
+from flask import Flask, request
 from flask_cors import CORS
-from flask_pydantic import validate
-
-from src.api.models import CreateGameRequest, CreateGameResponse, Game, UpdateGameRequest
+from pydantic import ValidationError
+
+from src.api.models import (
+    CreateGameRequest,
+    CreateGameResponse,
+    Game,
+    UpdateGameRequest,
+    dump_game,
+    load_game,
+)
 from src.api.utils import (
     API_APP_NAME,
     app_image,
-    cloudflare_secret,
     game_queue,
     game_store,
     get_scope,
+    get_wiki_db,
     setup_logger,
+    wiki_data_mount,
 )
 from src.api.worker import manage_queue, worker_app
-from src.eval import path_transformer as local_path_transformer
 from src.utils import ArticleNotFound
-from src.wiki_db import WikiData
-
-load_dotenv()
 
 logger = setup_logger(API_APP_NAME)
 
@@ -43,12 +46,22 @@ CORS(
 )
 
 
+# Request validators bound once; bodies are validated straight from the raw request bytes
+_create_game_validator = CreateGameRequest.__pydantic_validator__
+_update_game_validator = UpdateGameRequest.__pydantic_validator__
+
+
+def json_response(payload: dict, status: int = 200):
+    """Serialize a response body with orjson, which encodes datetimes natively."""
+    return orjson.dumps(payload), status, {"Content-Type": "application/json"}
+
+
 @server.get("/game/<uuid:game_id>")
 def get_game(game_id):
     game_id = str(game_id)
     try:
-        game: Game = Game(**json.loads(game_store[game_id]))
-        return game.to_api_response(), 200
+        game: Game = load_game(game_store[game_id])
+        return json_response(game.to_api_response())
     except KeyError as e:
         logger.exception(e)
         return f"Game {game_id} not found", 404
@@ -58,45 +71,43 @@ def get_game(game_id):
 
 
 @server.post("/game")
-@validate()
-def create_game(body: CreateGameRequest):
+def create_game():
+    try:
+        body: CreateGameRequest = _create_game_validator.validate_json(request.get_data())
+    except ValidationError as e:
+        return e.json(), 400, {"Content-Type": "application/json"}
     try:
         game_id = str(uuid4())
         server.logger.debug(game_id)
-        if game_id in game_store:
+        game = Game(
+            id=game_id,
+            start_article=body.start_article,
+            end_article=body.end_article,
+            player=body.player,
+        )
+
+        # Get url for starting article
+        db = get_wiki_db(get_scope())
+
+        # Only the url is needed here, so skip the article text
+        start_page = db.get_page_light(body.start_article)
+        # Only validate the end article; its page content isn't needed yet
+        if not db.exists(body.end_article):
+            raise ArticleNotFound(f"Article '{body.end_article}' not found in DB.")
+
+        game.add_move(article=body.start_article, url=start_page.url)
+        # Single conditional write instead of a separate membership RPC
+        if not game_store.put(game_id, dump_game(game), skip_if_exists=True):
             return f"Game id {game_id} already in store.", 500
-        else:
-            game = Game(
-                id=game_id,
-                start_article=body.start_article,
-                end_article=body.end_article,
-                player=body.player,
-            )
-
-            # Get url for starting article
-            index_path = "./index.lmdb" if get_scope() == "local" else "/data/2025-06-01/index.lmdb"
-            path_transformer = (
-                local_path_transformer
-                if get_scope() == "local"
-                else (lambda x: x.replace("..", "/data"))
-            )
-
-            db = WikiData(index_path, path_transformer)
-
-            start_page = db.get_page(body.start_article)
-            db.get_page(body.end_article)
-
-            game.add_move(article=body.start_article, url=start_page.url)
-            game_store[game_id] = game.model_dump_json()
-            if body.player == "ai":
-                logger.info("Adding game to processing queue")
-                game_queue.put(game_id)
-                # Turn on the queue processor, if not started yet
-                stats = manage_queue.get_current_stats()
-                logger.info(f"NUM RUNNERS: {stats.num_total_runners}")
-                if manage_queue.get_current_stats().backlog < 2 and get_scope() != "local":
-                    manage_queue.spawn()
-            return CreateGameResponse(id=game_id), 200
+        if body.player == "ai":
+            logger.info("Adding game to processing queue")
+            game_queue.put(game_id)
+            # Turn on the queue processor, if not started yet
+            stats = manage_queue.get_current_stats()
+            logger.info(f"NUM RUNNERS: {stats.num_total_runners}")
+            if stats.backlog < 2 and get_scope() != "local":
+                manage_queue.spawn()
+        return json_response(CreateGameResponse(id=game_id).model_dump())
     except ArticleNotFound as e:
         logger.exception(e)
         return "Start or end article not found in DB. Try different articles", 400
@@ -106,14 +117,17 @@ def create_game(body: CreateGameRequest):
 
 
 @server.post("/game/<uuid:game_id>")
-@validate()
-def update_game(game_id, body: UpdateGameRequest):
+def update_game(game_id):
     game_id = str(game_id)
     try:
-        game: Game = Game(**json.loads(game_store[game_id]))
+        body: UpdateGameRequest = _update_game_validator.validate_json(request.get_data())
+    except ValidationError as e:
+        return e.json(), 400, {"Content-Type": "application/json"}
+    try:
+        game: Game = load_game(game_store[game_id])
         game.add_move(article=body.article, url=body.url if body.url else "")
-        game_store[game_id] = game.model_dump_json()
-        return game.to_api_response(), 200
+        game_store[game_id] = dump_game(game)
+        return json_response(game.to_api_response())
     except KeyError:
         return f"Game {game_id} not found", 404
     except Exception:
@@ -130,18 +144,8 @@ def delete_game(game_id):
         return "Internal error", 500
 
 
-@app.function(
-    volumes={
-        "/data": modal.CloudBucketMount(
-            bucket_name="wiki-data",
-            bucket_endpoint_url="https://684be30d0e8fbd7eb2bab9bb2823cd14.r2.cloudflarestorage.com",
-            secret=cloudflare_secret,
-            read_only=True,
-        )
-    }
-)
+@app.function(volumes={"/data": wiki_data_mount})
 # @modal.concurrent(max_inputs=10)
 @modal.wsgi_app(label="api")
 def flask_app():
-    load_dotenv()
     return server
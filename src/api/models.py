@@ -1,8 +1,8 @@
 from datetime import datetime, timezone
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Set
 from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class Move(BaseModel):
@@ -23,6 +23,13 @@ class Game(BaseModel):
     current_article: str = Field(default="")
     is_complete: bool = Field(default=False)
     player: Literal["human", "ai"] = Field(default="human")
+    visited_articles: Set[str] = Field(default_factory=set, exclude=True)
+
+    @model_validator(mode="after")
+    def _populate_visited_articles(self) -> "Game":
+        """Rebuild the (unserialized) visited set from the move history on load."""
+        self.visited_articles = {move.article for move in self.moves}
+        return self
 
     @property
     def last_move_article(self) -> Optional[str]:
@@ -38,6 +45,7 @@ class Game(BaseModel):
             return False  # Duplicate move, don't add
 
         self.moves.append(Move(article=article, url=url))
+        self.visited_articles.add(article)
         self.current_article = article
 
         if article.lower() == self.end_article.lower():
@@ -46,13 +54,13 @@ class Game(BaseModel):
         return True
 
     def to_api_response(self) -> dict:
-        """Convert game to API response format."""
+        """Convert game to API response format. Timestamps are left as datetimes for orjson."""
         return {
             "id": self.id,
             "startArticle": self.start_article,
             "endArticle": self.end_article,
             "moves": [
-                {"article": move.article, "timestamp": move.timestamp.isoformat(), "url": move.url}
+                {"article": move.article, "timestamp": move.timestamp, "url": move.url}
                 for move in self.moves
             ],
             "currentArticle": self.current_article,
@@ -60,6 +68,21 @@ class Game(BaseModel):
         }
 
 
+# Bound once so the hot store read/write paths go straight to pydantic-core
+_GAME_SERIALIZER = Game.__pydantic_serializer__
+_GAME_VALIDATOR = Game.__pydantic_validator__
+
+
+def dump_game(game: Game) -> bytes:
+    """Serialize a game to JSON bytes for the game store."""
+    return _GAME_SERIALIZER.to_json(game)
+
+
+def load_game(data: str | bytes) -> Game:
+    """Parse and validate a game from its stored JSON."""
+    return _GAME_VALIDATOR.validate_json(data)
+
+
 # Request/Response models for API endpoints
 class CreateGameRequest(BaseModel):
     player: Literal["human", "ai"] = "human"
@@ -1,10 +1,15 @@
 import logging
 import os
+import threading
+import time
 from typing import Literal
 
 import modal
 from dotenv import load_dotenv
 
+from src.wiki_db import WikiData
+from src.wiki_db import path_transformer as local_path_transformer
+
 API_APP_NAME = "wiki-game"
 WORKER_APP_NAME = "wiki-worker"
 
@@ -13,8 +18,7 @@ class CustomFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
         # Format: MM/DD HH:MM:SS.sss
         ct = self.converter(record.created)
-        t = f"{ct.tm_mon:02d}/{ct.tm_mday:02d} {ct.tm_hour:02d}:{ct.tm_min:02d}:{ct.tm_sec:02d}.{int(record.msecs):03d}"
-        return t
+        return f"{time.strftime('%m/%d %H:%M:%S', ct)}.{int(record.msecs):03d}"
 
 
 def setup_logger(app_name: str) -> logging.Logger:
@@ -25,15 +29,47 @@ def setup_logger(app_name: str) -> logging.Logger:
     return logging.getLogger(app_name)
 
 
+load_dotenv()
+SCOPE: Literal["local", "remote"] = "local" if os.getenv("SCOPE", "remote") == "local" else "remote"
+
+
 def get_scope() -> Literal["local", "remote"]:
-    load_dotenv()
-    return "local" if os.getenv("SCOPE", "remote") == "local" else "remote"
+    return SCOPE
+
+
+_wiki_db_cache: dict[str, WikiData] = {}
+_wiki_db_lock = threading.Lock()
+
+
+def get_wiki_db(scope: Literal["local", "remote"]) -> WikiData:
+    """Returns a process-wide WikiData instance for the given scope, opening it on first use."""
+    index_path = "./index.lmdb" if scope == "local" else "/data/2025-06-01/index.lmdb"
+    db = _wiki_db_cache.get(index_path)
+    if db is None:
+        with _wiki_db_lock:
+            db = _wiki_db_cache.get(index_path)
+            if db is None:
+                path_transformer = (
+                    local_path_transformer
+                    if scope == "local"
+                    else (lambda x: x.replace("..", "/data"))
+                )
+                db = WikiData(index_path, path_transformer)
+                _wiki_db_cache[index_path] = db
+    return db
 
 
 app_image = modal.Image.debian_slim().uv_sync().add_local_python_source("src")
 cloudflare_secret = modal.Secret.from_name(
     "r2-secret", required_keys=["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"]
 )
+# Read-only R2 mount of the wiki dataset, shared by the API and worker functions at /data
+wiki_data_mount = modal.CloudBucketMount(
+    bucket_name="wiki-data",
+    bucket_endpoint_url="https://684be30d0e8fbd7eb2bab9bb2823cd14.r2.cloudflarestorage.com",
+    secret=cloudflare_secret,
+    read_only=True,
+)
 
 game_store = modal.Dict.from_name("game-store", create_if_missing=True)
 
@@ -1,30 +1,29 @@
-import json
-import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 import modal
-from dotenv import dotenv_values, load_dotenv
+from dotenv import dotenv_values
 
-from src.api.models import Game
+from src.api.models import Game, dump_game, load_game
 from src.api.utils import (
     WORKER_APP_NAME,
     app_image,
-    cloudflare_secret,
     game_queue,
     game_store,
     get_scope,
+    get_wiki_db,
     setup_logger,
+    wiki_data_mount,
 )
-from src.eval import create_client, get_next_article
-from src.eval import path_transformer as local_path_transformer
 from src.models import GroqSupportedModel, Provider
-from src.wiki_db import WikiData
-
-load_dotenv()
 
 logger = setup_logger(WORKER_APP_NAME)
 
 worker_app = modal.App(name=WORKER_APP_NAME, image=app_image)
 
+# Number of games advanced per process_queue_item call
+QUEUE_BATCH_SIZE = 4
+
 
 @worker_app.function(
     timeout=86400,
@@ -34,99 +33,98 @@ worker_app = modal.App(name=WORKER_APP_NAME, image=app_image)
     scaledown_window=2,
 )
 def manage_queue():
-    poll_until = time.time() + 5
-    while time.time() < poll_until:
-        if game_queue.len():
-            logger.info("Processing queue item")
-
-            if get_scope() == "remote":
-                process_queue_item.spawn()
-            else:
-                process_queue_item.local()
-
-            # Reset poll_until
-            poll_until = time.time() + 5
+    idle_timeout = 5
+    while True:
+        # Block until a game is queued, so pickup is immediate instead of on the next poll tick
+        try:
+            game_ids = game_queue.get_many(QUEUE_BATCH_SIZE, timeout=idle_timeout)
+        except queue.Empty:
+            logger.info("No tasks in queue for %d seconds. Stopping." % idle_timeout)
+            return
+
+        logger.info(f"Processing {len(game_ids)} queue item(s)")
+        if get_scope() == "remote":
+            process_queue_item.spawn(game_ids)
         else:
-            logger.info(
-                "No tasks in queue. Waiting for tasks... (will stop in %d seconds)"
-                % int(poll_until - time.time())
-            )
-
-        time.sleep(1)
+            process_queue_item.local(game_ids)
 
 
 @worker_app.function(
-    volumes={
-        "/data": modal.CloudBucketMount(
-            bucket_name="wiki-data",
-            bucket_endpoint_url="https://684be30d0e8fbd7eb2bab9bb2823cd14.r2.cloudflarestorage.com",
-            secret=cloudflare_secret,
-            read_only=True,
-        )
-    },
+    volumes={"/data": wiki_data_mount},
     secrets=[modal.Secret.from_dict(dotenv_values() | {"SCOPE": None})],
 )
-def process_queue_item():
-    top_game_id = None
+def process_queue_item(game_ids: list[str]):
+    # Imported here rather than at module level since the API app imports this module, and
+    # src.eval pulls in dspy and litellm, which only the worker needs
+    from src.eval import create_client
+
+    provider, model = Provider.GROQ, GroqSupportedModel.GPT_OSS_20B
     try:
-        top_game_id = game_queue.get()
-        # Iterate on the game
-        game: Game = Game(**json.loads(game_store[top_game_id]))
+        client = create_client(provider, model)
+        db = get_wiki_db(get_scope())
+    except Exception as e:
+        logger.exception(e)
+        game_queue.put_many(game_ids)
+        return
 
-        provider, model = Provider.GROQ, GroqSupportedModel.GPT_OSS_20B
+    logger.info(f"Processing games {game_ids} with provider {provider} and model {model}")
 
-        logger.info(f"Processing game {top_game_id} with provider {provider} and model {model}")
+    # Advance the batch's games concurrently, so each waits only for its own LLM call
+    with ThreadPoolExecutor(max_workers=len(game_ids)) as executor:
+        requeue = executor.map(lambda game_id: _advance_game(game_id, client, db), game_ids)
+        requeue_ids = [game_id for game_id, again in zip(game_ids, requeue) if again]
 
-        client = create_client(provider, model)
+    # Re-queue the unfinished games with one round-trip
+    if requeue_ids:
+        game_queue.put_many(requeue_ids)
+        # Restart manager if shut down
+        if manage_queue.get_current_stats().backlog < 2 and get_scope() != "local":
+            manage_queue.spawn()
 
-        index_path = "./index.lmdb" if get_scope() == "local" else "/data/2025-06-01/index.lmdb"
-        path_transformer = (
-            local_path_transformer
-            if get_scope() == "local"
-            else (lambda x: x.replace("..", "/data"))
-        )
-
-        db = WikiData(index_path, path_transformer)
-
-        current_article_name = (
-            game.current_article if game.current_article != "" else game.start_article
-        )
-        current_article = db.get_page(current_article_name)
-
-        # Prune previously visited pages from the available links list
-        visited_pages = set(map(lambda move: move.article, game.moves))
-        current_article.links = list(
-            filter(lambda link: link not in visited_pages, current_article.links)
-        )
-
-        next_article = get_next_article(
-            current_article=current_article,
-            goal=game.end_article,
-            invoke=client.invoke,
-            wiki_data=db,
-            ctrl_f=True,
-        )
-
-        # Update game with next step
+
+def _advance_game(game_id: str, client, db) -> bool:
+    """Play one step of a game and save it. Returns whether the game should be re-queued."""
+    from src.eval import get_next_article
+
+    try:
+        # Iterate on the game
+        game: Game = load_game(game_store[game_id])
+
+        # One read txn for every index lookup made while advancing this game
+        with db.read_txn():
+            current_article_name = (
+                game.current_article if game.current_article != "" else game.start_article
+            )
+            current_article = db.get_page(current_article_name)
+
+            # Prune previously visited pages from the available links list
+            current_article.links = [
+                link for link in current_article.links if link not in game.visited_articles
+            ]
+
+            next_article = get_next_article(
+                current_article=current_article,
+                goal=game.end_article,
+                invoke=client.invoke,
+                wiki_data=db,
+                ctrl_f=True,
+            )
+
+        # Update game with next step, saving it as soon as the step is done
         game.add_move(article=next_article.title, url=next_article.url)
-        game_store[top_game_id] = game.model_dump_json()
-
-        # If not complete, push back to queue
-        if not game.is_complete and top_game_id:
-            game_queue.put(top_game_id)
-            # Restart manager if shut down
-            if manage_queue.get_current_stats().backlog < 2 and get_scope() != "local":
-                manage_queue.spawn()
+        game_store[game_id] = dump_game(game)
     except KeyError as e:
         logger.exception(e)
         # Game not found, was deleted from store. We don't want to re-queue it in this case
-        logger.error(f"Game not found, was deleted from store. Game ID: {top_game_id}")
+        logger.error(f"Game not found, was deleted from store. Game ID: {game_id}")
+        return False
     except Exception as e:
         logger.exception(e)
-        if top_game_id:
-            game_queue.put(top_game_id)
+        return True
+
+    # If not complete, push back to queue
+    return not game.is_complete
 
 
 if __name__ == "__main__":
-    load_dotenv()
     manage_queue.local()
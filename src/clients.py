@@ -1,7 +1,10 @@
+import asyncio
+import json
 import os
 import random
 import signal
 import subprocess
+import threading
 import time
 from abc import ABC, abstractmethod
 from warnings import warn
@@ -9,13 +12,90 @@ from warnings import warn
 import dspy
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src import models
-from src.signatures import get_next_page, get_next_page_chain
+from src.signatures import (
+    first_valid_link,
+    get_next_page,
+    get_next_page_chain,
+    get_next_page_samples,
+)
 from src.utils import NotImplementedWarning
 
+# Local cache of the Ollama model list, so repeat runs can skip the /api/tags probe
+OLLAMA_TAGS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".wikigame", "ollama_tags.json")
+OLLAMA_TAGS_CACHE_TTL = 24 * 60 * 60
+# Seconds to wait for a freshly started `ollama serve` to answer
+OLLAMA_STARTUP_TIMEOUT = 30
+
+# Popen arguments that start a child in its own process group, so it can be stopped along with
+# anything it spawns. On POSIX, start_new_session avoids preexec_fn so CPython can spawn via vfork.
+_NEW_PROCESS_GROUP = (
+    {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    if os.name == "nt"
+    else {"start_new_session": True}
+)
+
+# Transient LM errors (rate limits, timeouts, 5xx) are retried by litellm with exponential backoff
+LM_NUM_RETRIES = 3
+
+
+def _load_env():
+    """Load provider API keys from .env into the environment. Runs once, at import, so clients
+    only read os.environ."""
+    load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.pardir, ".env")))
+
+
+_load_env()
+
+
+class CircuitBreaker:
+    """Trips after `failure_threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds, after which a single trial call is let through (half-open). Every call let through
+    must be followed by `record_success` or `record_failure`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        # Set while the half-open trial call is running, so concurrent callers keep failing fast
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_in_flight:
+                return False
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: the trial's outcome either closes the breaker or re-opens it
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
 
 class BaseModelClient(ABC):
+    # Whether the provider returns several completions for one request (`n` > 1). If not,
+    # candidate links are drawn with sequential Refine retries instead.
+    supports_multi_sample = False
+
     def __init__(self, provider_name: str, model_name: str):
         if not self._is_supported_model(model_name):
             raise ValueError(f"Model {model_name} is not supported by provider.")
@@ -23,6 +103,8 @@ class BaseModelClient(ABC):
         self.api_key = self.get_api_key(provider_name)
         self.temperature = 0.0
         self.lm = None
+        # Fails fast to a random link while the provider keeps erroring after litellm's retries
+        self.breaker = CircuitBreaker()
 
     @abstractmethod
     def _is_supported_model(self, model_name: str) -> bool:
@@ -36,38 +118,47 @@ class BaseModelClient(ABC):
     def invoke(self, page: models.Page, goal_page_title: str) -> str:
         if not self.lm:
             raise NotImplementedError("Language model not initialized.")
+        if not self.breaker.allow():
+            print("Provider circuit open after repeated failures. Returning random link...")
+            return random.choice(page.links)
         with dspy.context(lm=self.lm):
             try:
-                model_output = get_next_page(
-                    input=models.StepInput(
-                        current_page=page,
-                        goal_page_title=goal_page_title,
-                    ),
+                step_input = models.StepInput.model_construct(
+                    current_page=page,
+                    goal_page_title=goal_page_title,
                 )
+                if self.supports_multi_sample:
+                    next_link = first_valid_link(get_next_page_samples(input=step_input), page)
+                else:
+                    next_link = get_next_page(input=step_input).output.selected_link
 
-                if (next_link := model_output.output.selected_link) not in page.links:
+                if next_link not in page.links_set:
                     print("Raw predict failed to return a valid link. Attempting CoT...")
-                    model_output = get_next_page_chain(
-                        input=models.StepInput(
-                            current_page=page,
-                            goal_page_title=goal_page_title,
-                        ),
-                    )
+                    model_output = get_next_page_chain(input=step_input)
                     next_link = model_output.output.selected_link
 
                 # If still not there, return random link
-                if next_link not in page.links:
+                if next_link not in page.links_set:
                     print("CoT predict failed to return a valid link. Returning random link...")
                     next_link = random.choice(page.links)
+                self.breaker.record_success()
             except Exception as e:
+                self.breaker.record_failure()
                 print(f"Error occurred during prediction: {e}. Returning random link...")
                 next_link = random.choice(page.links)
             finally:
                 return next_link
 
+    async def ainvoke(self, page: models.Page, goal_page_title: str) -> str:
+        """Async variant of `invoke`.
+
+        The blocking DSPy call runs in a worker thread (with its own dspy.context), so many games
+        can have LLM requests in flight at once.
+        """
+        return await asyncio.to_thread(self.invoke, page, goal_page_title)
+
     def get_api_key(self, provider_name: str) -> str:
-        load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.pardir, ".env")))
-        api_key = os.getenv(f"{provider_name.upper()}_API_KEY")
+        api_key = os.environ.get(f"{provider_name.upper()}_API_KEY")
         if not api_key:
             raise ValueError(f"API key for {provider_name} not found in .env file.")
         return api_key
@@ -78,6 +169,11 @@ class OllamaClient(BaseModelClient):
         super().__init__(models.Provider.OLLAMA, model_name)
         self.server_url = "http://localhost:11434"
         self.ollama_process = None
+        # Keep-alive session so startup polling and the model check reuse one connection
+        self._session = requests.Session()
+        self._session.mount(
+            "http://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=Retry(total=0))
+        )
         self.setup_ollama_process()
         self.lm = dspy.LM(
             api_base=f"{self.server_url}",
@@ -85,52 +181,72 @@ class OllamaClient(BaseModelClient):
             model=f"ollama_chat/{self.model_name}",
             model_type="chat",
             temperature=self.temperature,
+            num_retries=LM_NUM_RETRIES,
         )
 
     def __del__(self):
         self.terminate_ollama_process()
+        if hasattr(self, "_session"):
+            self._session.close()
 
     def _is_supported_model(self, model_name: str) -> bool:
         return model_name in models.OllamaSupportedModel
 
+    def _server_ready(self, timeout: float) -> bool:
+        """Whether the server answers. Probes with HEAD so the model listing isn't sent; servers
+        that don't route HEAD there get the small GET /api/version instead. Raises
+        requests.RequestException if the server can't be reached."""
+        response = self._session.head(f"{self.server_url}/api/tags", timeout=timeout)
+        if response.status_code in (404, 405):
+            response = self._session.get(f"{self.server_url}/api/version", timeout=timeout)
+        return response.status_code == 200
+
     def setup_ollama_process(self):
         # Check if Ollama is already running
         try:
-            response = requests.get(f"{self.server_url}/api/tags", timeout=2)
-            if response.status_code == 200:
+            if self._server_ready(timeout=2):
                 print("Ollama is already running")
                 self.ollama_process = None
             else:
                 raise requests.exceptions.RequestException()
         except requests.exceptions.RequestException:
-            print("Starting Ollama server...")
+            # `ollama serve` inherits OLLAMA_MODELS, so a persisted model directory skips the pull
+            models_dir = os.getenv("OLLAMA_MODELS", os.path.join("~", ".ollama", "models"))
+            print(f"Starting Ollama server (models in {models_dir})...")
             # Start Ollama server
             self.ollama_process = subprocess.Popen(
                 ["ollama", "serve"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid,
+                # Nothing reads the server's logs, and an unread pipe would block it once full
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                **_NEW_PROCESS_GROUP,
             )
 
-            # Wait for Ollama to start
-            max_retries = 30
-            for i in range(max_retries):
+            # Wait for Ollama to start, polling quickly at first since it is usually up in < 1s
+            start = time.monotonic()
+            deadline = start + OLLAMA_STARTUP_TIMEOUT
+            delay = 0.05
+            while True:
                 try:
-                    response = requests.get(f"{self.server_url}/api/tags", timeout=2)
-                    if response.status_code == 200:
-                        print(f"Ollama started successfully after {i+1} retries")
+                    if self._server_ready(timeout=1):
+                        print(f"Ollama started successfully after {time.monotonic() - start:.2f}s")
                         break
                 except requests.exceptions.RequestException:
                     pass
-                time.sleep(1)
-            else:
-                self.terminate_ollama_process()
-                raise RuntimeError("Ollama failed to start within timeout period")
+                if time.monotonic() >= deadline:
+                    self.terminate_ollama_process()
+                    raise RuntimeError("Ollama failed to start within timeout period")
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
 
         # Ensure model is available
         print(f"Checking if model {self.model_name} is available...")
+        cached_model_names = self._load_cached_tags()
+        if cached_model_names is not None and self.model_name in cached_model_names:
+            print(f"Model {self.model_name} is already available (cached)")
+            return
         try:
-            models_response = requests.get(f"{self.server_url}/api/tags")
+            models_response = self._session.get(f"{self.server_url}/api/tags")
             if models_response.status_code == 200:
                 models = models_response.json()
                 model_names = [model["name"] for model in models.get("models", [])]
@@ -148,64 +264,108 @@ class OllamaClient(BaseModelClient):
                             f"Failed to pull model {self.model_name}: {pull_result.stderr}"
                         )
                     print(f"Model {self.model_name} pulled successfully")
+                    model_names.append(self.model_name)
                 else:
                     print(f"Model {self.model_name} is already available")
+                self._save_cached_tags(model_names)
         except Exception as e:
             self.terminate_ollama_process()
             raise RuntimeError(f"Failed to verify model availability: {e}")
 
+    @staticmethod
+    def _load_cached_tags(ttl: int = OLLAMA_TAGS_CACHE_TTL) -> list[str] | None:
+        """Returns cached Ollama model names, or None if the cache is missing, stale or disabled.
+
+        Set WIKIGAME_DISABLE_TAG_CACHE to always query the server.
+        """
+        if os.getenv("WIKIGAME_DISABLE_TAG_CACHE"):
+            return None
+        try:
+            if time.time() - os.path.getmtime(OLLAMA_TAGS_CACHE_PATH) > ttl:
+                return None
+            with open(OLLAMA_TAGS_CACHE_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_cached_tags(model_names: list[str]):
+        """Writes the Ollama model names to the local cache. Failures are ignored."""
+        if os.getenv("WIKIGAME_DISABLE_TAG_CACHE"):
+            return
+        try:
+            os.makedirs(os.path.dirname(OLLAMA_TAGS_CACHE_PATH), exist_ok=True)
+            with open(OLLAMA_TAGS_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump(model_names, f)
+        except OSError:
+            pass
+
     def terminate_ollama_process(self):
         """Terminate Ollama process if we started it."""
-        if self.ollama_process:
+        # getattr: __del__ also runs on clients whose __init__ raised before the attribute was set
+        if getattr(self, "ollama_process", None):
             print("Terminating Ollama process...")
-            try:
-                os.killpg(os.getpgid(self.ollama_process.pid), signal.SIGTERM)
-                self.ollama_process.wait(timeout=5)
-            except (subprocess.TimeoutExpired, ProcessLookupError):
-                try:
-                    os.killpg(os.getpgid(self.ollama_process.pid), signal.SIGKILL)
-                except ProcessLookupError:
-                    pass
+            _terminate_process_group(self.ollama_process)
+            self.ollama_process = None
             print("Ollama process terminated")
 
 
-class OpenRouterClient(BaseModelClient):
-    def __init__(self, model_name: str):
-        super().__init__(models.Provider.OPENROUTER, model_name)
-        self.lm = dspy.LM(
-            f"openrouter/{self.model_name}",
-            api_key=self.api_key,
-            temperature=self.temperature,
-        )
+def _terminate_process_group(process: subprocess.Popen, grace: float = 0.1):
+    """SIGTERM the process's whole group, then SIGKILL it if it hasn't exited after `grace`
+    seconds. The process must have been started with `_NEW_PROCESS_GROUP`.
 
-    def _is_supported_model(self, model_name: str) -> bool:
-        return model_name in models.OpenRouterSupportedModel
+    Windows has no process groups to signal, so there the group gets CTRL_BREAK_EVENT and the
+    process is killed after the grace period.
+    """
+    if os.name == "nt":
+        try:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        return
+    try:
+        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+            process.wait(timeout=1)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            pass
+    except ProcessLookupError:
+        pass
 
 
-class CerebrasClient(BaseModelClient):
-    def __init__(self, model_name: str):
-        super().__init__(models.Provider.CEREBRAS, model_name)
-        self.lm = dspy.LM(
-            f"cerebras/{self.model_name}",
-            api_key=self.api_key,
-            temperature=self.temperature,
-        )
+# Providers reached purely through litellm: (model prefix, supported models, supports n > 1)
+_API_CLIENT_REGISTRY: dict[str, tuple[str, type[models.SupportedModel], bool]] = {
+    models.Provider.OPENROUTER: ("openrouter/", models.OpenRouterSupportedModel, True),
+    models.Provider.CEREBRAS: ("cerebras/", models.CerebrasSupportedModel, False),
+    models.Provider.GROQ: ("groq/", models.GroqSupportedModel, False),
+}
 
-    def _is_supported_model(self, model_name: str) -> bool:
-        return model_name in models.CerebrasSupportedModel
 
+class SimpleAPIClient(BaseModelClient):
+    """Client for any hosted provider in `_API_CLIENT_REGISTRY`."""
 
-class GroqClient(BaseModelClient):
-    def __init__(self, model_name: str):
-        super().__init__(models.Provider.GROQ, model_name)
+    def __init__(self, provider: str, model_name: str):
+        self.model_prefix, self.supported_models, self.supports_multi_sample = (
+            _API_CLIENT_REGISTRY[provider]
+        )
+        super().__init__(provider, model_name)
         self.lm = dspy.LM(
-            f"groq/{self.model_name}",
+            f"{self.model_prefix}{self.model_name}",
             api_key=self.api_key,
             temperature=self.temperature,
+            num_retries=LM_NUM_RETRIES,
         )
 
     def _is_supported_model(self, model_name: str) -> bool:
-        return model_name in models.GroqSupportedModel
+        return model_name in self.supported_models
 
 
 def create_client(provider: str, model: str) -> BaseModelClient:
@@ -223,11 +383,6 @@ def create_client(provider: str, model: str) -> BaseModelClient:
     """
     if provider == models.Provider.OLLAMA:
         return OllamaClient(model)
-    elif provider == models.Provider.OPENROUTER:
-        return OpenRouterClient(model)
-    elif provider == models.Provider.CEREBRAS:
-        return CerebrasClient(model)
-    elif provider == models.Provider.GROQ:
-        return GroqClient(model)
-    else:
+    if provider not in _API_CLIENT_REGISTRY:
         raise ValueError(f"Unsupported provider: {provider}")
+    return SimpleAPIClient(provider, model)
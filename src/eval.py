@@ -1,4 +1,6 @@
-from typing import Callable
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
 
 from src.clients import create_client
 from src.models import (  # noqa: F401
@@ -11,7 +13,10 @@ from src.models import (  # noqa: F401
 )
 from src.signatures import get_next_page
 from src.utils import ArticleNotFound
-from src.wiki_db import WikiData
+from src.wiki_db import WikiData, path_transformer  # noqa: F401
+
+# Prefetch reads get their own threads so they can't delay the LM calls on the default executor
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
 
 
 def get_next_article(
@@ -19,7 +24,7 @@ def get_next_article(
     goal: str,
     invoke: Callable[[Page, str], str],
     wiki_data: WikiData,
-    ctrl_f: bool = False,
+    ctrl_f: bool = True,
 ) -> Page:
     """Get the next article by invoking the function and looking up the result in LMDB.
 
@@ -28,7 +33,8 @@ def get_next_article(
         goal: The goal page to get to
         invoke: A callable that takes a Page and returns a link string
         wiki_data: WikiData instance for looking up article locations
-        ctrl_f: (Default False) don't run invocation if the goal link is on the page
+        ctrl_f: (Default True) don't run invocation if the goal link is on the page.
+            Only disable for ablations that measure whether the model finds the goal link itself
 
     Returns:
         Page object for the next article
@@ -36,13 +42,75 @@ def get_next_article(
     Raises:
         ArticleNotFound: If the article is not found in the index or cannot be retrieved
     """
-    if ctrl_f and goal in current_article.links:
+    if ctrl_f and goal in current_article.links_set:
         # Shortcut if 1 step away
         return wiki_data.get_page(goal)
     # Get the next link from the invoke function
     next_link = invoke(current_article, goal)
+    return _get_page_for_link(next_link, wiki_data)
+
+
+async def aget_next_article(
+    current_article: Page,
+    goal: str,
+    ainvoke: Callable[[Page, str], Awaitable[str]],
+    wiki_data: WikiData,
+    ctrl_f: bool = True,
+    prefetch: int = 3,
+) -> Page:
+    """Async variant of `get_next_article` that awaits `ainvoke` for the next link.
+
+    While the LM call is in flight, up to `prefetch` likely next pages (see `_prefetch_candidates`)
+    are loaded on a small executor of their own, so they never hold up the LM call. A hit skips
+    the disk read. Misses aren't waited for: reads that haven't started are cancelled, and running
+    ones finish in the background, still warming the page cache.
+    """
+    if ctrl_f and goal in current_article.links_set:
+        # Shortcut if 1 step away
+        return wiki_data.get_page(goal)
+    lm_call = asyncio.ensure_future(ainvoke(current_article, goal))
+    # Let the LM call start before any prefetch is queued
+    await asyncio.sleep(0)
+    loop = asyncio.get_running_loop()
+    prefetched = {
+        candidate: loop.run_in_executor(_PREFETCH_EXECUTOR, wiki_data.get_page, candidate)
+        for candidate in _prefetch_candidates(current_article, goal, prefetch)
+    }
+    try:
+        next_link = await lm_call
+    except BaseException:
+        for future in prefetched.values():
+            future.cancel()
+        raise
+    hit = prefetched.pop(next_link, None)
+    for future in prefetched.values():
+        future.cancel()
+    if hit is not None:
+        try:
+            return await hit
+        except Exception:
+            # Let the regular lookup below report the failure
+            pass
+    return _get_page_for_link(next_link, wiki_data)
+
 
-    # Validate the invoke result
+def _prefetch_candidates(current_article: Page, goal: str, k: int) -> list[str]:
+    """Picks the k links sharing the most words with the goal title, as a cheap guess at where
+    the model will click next."""
+    if k <= 0:
+        return []
+    goal_words = set(goal.lower().split())
+    scored = []
+    for link in current_article.links:
+        overlap = len(goal_words.intersection(link.lower().split()))
+        if overlap:
+            scored.append((overlap, link))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [link for _, link in scored[:k]]
+
+
+def _get_page_for_link(next_link: str, wiki_data: WikiData) -> Page:
+    """Validates a link returned by an invoke function and looks up its page."""
     if next_link is None:
         raise ArticleNotFound("Invoke function returned None")
 
@@ -59,7 +127,7 @@ def invoke(
 ) -> str:
     """Calls a LM on a page to get next link (str)."""
     model_output = get_next_page(
-        input=StepInput(
+        input=StepInput.model_construct(
             current_page=page,
             goal_page_title=goal_page_title,
         ),
@@ -73,7 +141,7 @@ def run_one_game(
     invoke: Callable[[Page, str], str],
     db: WikiData,
     max_steps: int = 10,
-    ctrl_f: bool = False,
+    ctrl_f: bool = True,
 ) -> list[Page]:
     """
     Runs one round of the Wikipedia Game.
@@ -84,7 +152,8 @@ def run_one_game(
         invoke: Function to invoke to get the next link
         db: WikiData object for database access
         max_steps: Maximum number of steps allowed (default 10)
-        ctrl_f: (Default False) don't run invocation if the goal link is on the page
+        ctrl_f: (Default True) don't run invocation if the goal link is on the page.
+            Only disable for ablations that measure whether the model finds the goal link itself
 
     Returns:
         List of Page objects representing the path taken to reach the goal page
@@ -111,9 +180,76 @@ def run_one_game(
     return history
 
 
-def path_transformer(original_path: str) -> str:
-    """Transforms relative path in index so that LMDB can be called anywhere."""
-    return original_path.replace("..", ".")
+async def run_one_game_async(
+    start_page_title: str,
+    goal_page_title: str,
+    ainvoke: Callable[[Page, str], Awaitable[str]],
+    db: WikiData,
+    max_steps: int = 10,
+    ctrl_f: bool = True,
+    prefetch: int = 3,
+) -> list[Page]:
+    """Async variant of `run_one_game` that awaits `ainvoke` at each step, prefetching up to
+    `prefetch` candidate pages while each LM call is in flight."""
+    curr_article = db.get_page(start_page_title)
+    history = [curr_article]
+    for step in range(max_steps):
+        curr_article = await aget_next_article(
+            curr_article,
+            goal_page_title,
+            ainvoke,
+            wiki_data=db,
+            ctrl_f=ctrl_f,
+            prefetch=prefetch,
+        )
+        if curr_article.title == goal_page_title:
+            print("Done!")
+            return history
+        print(curr_article.title)
+        history.append(curr_article)
+    print(f"Max Steps of {max_steps} reached, but did not complete.")
+    return history
+
+
+async def run_games_batch(
+    start_page_titles: list[str],
+    goal_page_titles: list[str],
+    ainvoke: Callable[[Page, str], Awaitable[str]],
+    db: WikiData,
+    max_steps: int = 10,
+    ctrl_f: bool = True,
+    max_concurrency: int = 8,
+    prefetch: int = 3,
+) -> list[list[Page]]:
+    """
+    Runs several games concurrently so their LLM calls overlap.
+
+    Args:
+        start_page_titles: Titles of the starting pages, one per game
+        goal_page_titles: Titles of the goal pages, one per game
+        ainvoke: Async function to invoke to get the next link
+        db: WikiData object for database access
+        max_steps: Maximum number of steps allowed per game (default 10)
+        ctrl_f: (Default True) don't run invocation if the goal link is on the page.
+            Only disable for ablations that measure whether the model finds the goal link itself
+        max_concurrency: Maximum number of games in flight at once, to respect rate limits
+        prefetch: Candidate pages each game prefetches while its LM call is in flight (0 disables
+            prefetching)
+
+    Returns:
+        The history of each game, in the same order as the inputs
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(start_page_title: str, goal_page_title: str) -> list[Page]:
+        async with semaphore:
+            return await run_one_game_async(
+                start_page_title, goal_page_title, ainvoke, db, max_steps, ctrl_f, prefetch
+            )
+
+    return await asyncio.gather(
+        *(run(start, goal) for start, goal in zip(start_page_titles, goal_page_titles))
+    )
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 from enum import Enum, EnumMeta
+from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class StrEnumMeta(EnumMeta):
@@ -42,6 +43,17 @@ class Page(BaseModel):
     content: str
     links: list[str]
 
+    _links_set: frozenset[str] = PrivateAttr(default=frozenset())
+    _links_set_source: Optional[list[str]] = PrivateAttr(default=None)
+
+    @property
+    def links_set(self) -> frozenset[str]:
+        """Set view of `links` for O(1) membership checks. Rebuilt when `links` is reassigned."""
+        if self._links_set_source is not self.links:
+            self._links_set = frozenset(self.links)
+            self._links_set_source = self.links
+        return self._links_set
+
 
 class StepInput(BaseModel):
     current_page: Page
@@ -1,6 +1,11 @@
-from dspy import ChainOfThought, InputField, OutputField, Predict, Refine, Signature
+from typing import Optional
 
-from src.models import StepInput, StepOutput
+from dspy import ChainOfThought, InputField, OutputField, Predict, Prediction, Refine, Signature
+
+from src.models import Page, StepInput, StepOutput
+
+# Candidate links drawn per step before falling back to CoT
+NUM_SAMPLES = 3
 
 
 class Step(Signature):
@@ -9,18 +14,29 @@ class Step(Signature):
 
 
 def valid_link(args, pred) -> float:
-    return 1.0 if pred.output.selected_link in args["input"].current_page.links else 0.0
+    return 1.0 if pred.output.selected_link in args["input"].current_page.links_set else 0.0
 
 
 get_next_page = Refine(
     module=Predict(Step),
-    N=3,
+    N=NUM_SAMPLES,
     reward_fn=valid_link,
     threshold=1.0,
 )
+# Same candidates as get_next_page, but drawn in one request with n=NUM_SAMPLES. Only usable with
+# providers that accept the `n` parameter.
+get_next_page_samples = Predict(Step, n=NUM_SAMPLES)
 get_next_page_chain = Refine(
     module=ChainOfThought(Step),
     N=3,
     reward_fn=valid_link,
     threshold=1.0,
 )
+
+
+def first_valid_link(pred: Prediction, page: Page) -> Optional[str]:
+    """Returns the first sampled link that is on the page, or None if every completion missed."""
+    for output in pred.completions.output:
+        if output.selected_link in page.links_set:
+            return output.selected_link
+    return None
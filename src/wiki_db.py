@@ -1,33 +1,166 @@
-import json
+import hashlib
+import mmap
 import os
+import sys
 import tempfile
-from typing import Callable, Optional, Tuple
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import AnyStr, Callable, ContextManager, Iterable, Iterator, Optional, Tuple
 from urllib.parse import urlparse
 
 import lmdb
+import msgspec
+import orjson
+import zstandard
 
 from src.models import Page
 from src.utils import ArticleNotFound
 
-import shutil
-
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.config import Config
     HAS_BOTO3 = True
 except ImportError:
     HAS_BOTO3 = False
 
+# Index values are either a bare location, "location<SEP>byte offset<SEP>byte length" pointing at
+# the article's line within that JSONL file (see scripts/build_index.py --with-offsets), or
+# "location<SEP><zstd frame>" holding the article's page itself (--embed-pages)
+LOCATION_SEP = "\x1f"
+_LOCATION_SEP_BYTES = LOCATION_SEP.encode("utf-8")
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Optional sub-database mapping lowercased title -> canonical title (see
+# scripts/build_index.py --with-casefold). Its record lives in the main DB under this name, which
+# can't collide with an article title since MediaWiki strips leading underscores.
+CASEFOLD_DB = b"__casefold__"
+
+# Characters some JSONL writers escape (pandas escapes "/"), so titles containing them can't be
+# matched against the raw line bytes
+_JSON_ESCAPED_CHARS = frozenset('"\\/')
+
+
+def _title_needle(title: str) -> Optional[bytes]:
+    """Bytes that must appear verbatim in any JSONL line holding this title, or None if the title
+    may be escaped differently by different writers."""
+    if not title.isascii() or any(c in _JSON_ESCAPED_CHARS or c < " " for c in title):
+        return None
+    return title.encode("ascii")
+
+
+def _record_title(record: dict) -> str:
+    """A parsed JSONL record's title. A record without one is malformed, so like a record missing
+    any other field (see `_page_from_record`) it raises RuntimeError."""
+    title = record.get("title")
+    if not isinstance(title, str):
+        raise RuntimeError("An unknown error occurred.")
+    return title
+
+
+class _LightRecord(msgspec.Struct):
+    """The fields of a JSONL record that `get_page_light` needs. "text" isn't declared, so the
+    decoder skips over it without decoding the article body into a str."""
+
+    title: str
+    url: str
+    links: list[str]
+
+
+_LIGHT_RECORD_DECODER = msgspec.json.Decoder(_LightRecord)
+
+
+def _loads_without_text(line: bytes) -> dict:
+    """Parse a JSONL record with its "text" value left out (returned as an empty string)."""
+    try:
+        record = _LIGHT_RECORD_DECODER.decode(line)
+    except msgspec.DecodeError:
+        # Malformed lines and records missing a field take the usual path, which reports them
+        record = orjson.loads(line)
+        record["text"] = ""
+        return record
+    return {"title": record.title, "url": record.url, "text": "", "links": record.links}
+
+
+# boto3 clients are thread-safe and expensive to build (credential resolution, connection pool),
+# so every WikiData pointed at the same R2 account shares one
+_S3_CLIENT_CACHE: dict = {}
+_S3_CLIENT_LOCK = threading.Lock()
+
+
+def _iter_lines(buffer) -> Iterator[bytes]:
+    """Yield the lines of a bytes-like buffer (e.g. an mmap), each keeping its trailing newline."""
+    start, size = 0, len(buffer)
+    while start < size:
+        end = buffer.find(b"\n", start)
+        end = size if end == -1 else end + 1
+        yield buffer[start:end]
+        start = end
+
+
+def path_transformer(original_path: str) -> str:
+    """Transforms relative path in index so that LMDB can be called anywhere."""
+    return original_path.replace("..", ".")
+
+
+class _LRUCache:
+    """Small thread-safe LRU map. A size of 0 disables caching."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
 
 class WikiData:
     """A class for querying Wikipedia article locations from an LMDB database."""
 
-    def __init__(self, db_path: str, path_transformer: Optional[Callable[[str], str]] = None):
+    def __init__(
+        self,
+        db_path: str,
+        path_transformer: Optional[Callable[[str], str]] = None,
+        page_cache_size: Optional[int] = None,
+        txn_refresh_interval: int = 1024,
+        location_cache_size: int = 65536,
+        shard_index_cache_size: int = 1024,
+        shard_map_cache_size: int = 128,
+    ):
         """Initialize the WikiData instance with the path to the LMDB database.
 
         Args:
             db_path: Path to the LMDB database file. Supports R2 remote mounts, if db_path starts with r2://
             path_transformer: A function that takes a path string and returns a transformed path string
+            page_cache_size: Maximum number of pages kept in the in-memory LRU cache (0 disables it).
+                Defaults to $WIKI_PAGE_CACHE, or 4096
+            txn_refresh_interval: Number of lookups served by each thread's standing read txn before
+                it is reopened to pick up a fresh snapshot (0 opens a txn per lookup)
+            location_cache_size: Maximum number of get_article_location results kept in memory
+            shard_index_cache_size: Maximum number of local JSONL files whose title -> byte span
+                map is kept in memory, for indexes built without offsets (0 always scans the file)
+            shard_map_cache_size: Maximum number of local JSONL files kept memory-mapped between
+                reads (0 maps the file again on every read)
 
         Raises:
             lmdb.Error: If the database cannot be opened
@@ -36,15 +169,117 @@ class WikiData:
         self.path_transformer = path_transformer
         self.is_cloud = db_path.startswith('r2://')
         self.s3_client = None
-        self._temp_db_path = None
+        self._local = threading.local()
+        if page_cache_size is None:
+            page_cache_size = int(os.getenv("WIKI_PAGE_CACHE", 4096))
+        self._page_cache = _LRUCache(page_cache_size)
+        self._location_cache = _LRUCache(location_cache_size)
+        self._shard_index_cache = _LRUCache(shard_index_cache_size)
+        self._shard_map_cache = _LRUCache(shard_map_cache_size)
+        self.txn_refresh_interval = txn_refresh_interval
+        # Bumped by refresh() so every thread reopens its standing txn on its next lookup
+        self._txn_generation = 0
 
         if self.is_cloud:
+            # The bucket and index key are fixed for the instance, so parse the URL once
+            parsed = urlparse(db_path)
+            self._r2_bucket = parsed.netloc
+            self._r2_base = parsed.path.lstrip('/')
             if not HAS_BOTO3:
                 raise ImportError("boto3 is required for r2:// URLs. Please install it with: pip install boto3")
             self._setup_s3_client()
             self._download_index_file()
         else:
-            self.env = lmdb.open(db_path, readonly=True)
+            self.env = self._open_env(db_path)
+        self._casefold_db = self._open_casefold_db()
+
+    @staticmethod
+    def _open_env(path: str) -> lmdb.Environment:
+        """Open the index read-only so a single env can be shared across threads."""
+        return lmdb.open(
+            path,
+            readonly=True,
+            lock=False,
+            readahead=False,
+            max_readers=512,
+            meminit=False,
+            subdir=os.path.isdir(path),
+            max_dbs=2,
+        )
+
+    def _open_casefold_db(self) -> Optional["lmdb._Database"]:
+        """Returns the casefold sub-database, or None for indexes built without one."""
+        try:
+            return self.env.open_db(CASEFOLD_DB, create=False)
+        except lmdb.NotFoundError:
+            return None
+
+    @contextmanager
+    def read_txn(self) -> Iterator[lmdb.Transaction]:
+        """Share a single read txn across every lookup this thread makes inside the block.
+
+        Nested calls reuse the outer txn. The txn is opened with buffers=True, so values are
+        returned as memoryviews over the map and are only valid inside the block.
+        """
+        txn = getattr(self._local, "txn", None)
+        if txn is not None:
+            yield txn
+            return
+        with self.env.begin(buffers=True) as txn:
+            self._local.txn = txn
+            # The casefold handle must come from the same env as the txn, even across refresh()
+            self._local.txn_casefold_db = self._casefold_db
+            try:
+                yield txn
+            finally:
+                self._local.txn = None
+
+    def _begin(self) -> Tuple[ContextManager[lmdb.Transaction], Optional["lmdb._Database"]]:
+        """Returns this thread's shared read txn if one is open, else its standing read txn, along
+        with the casefold sub-database handle of the env that txn belongs to."""
+        txn = getattr(self._local, "txn", None)
+        if txn is not None:
+            return nullcontext(txn), self._local.txn_casefold_db
+        if self.txn_refresh_interval <= 0:
+            return self.env.begin(buffers=True), self._casefold_db
+        return nullcontext(self._standing_txn()), self._local.standing_casefold_db
+
+    def _standing_txn(self) -> lmdb.Transaction:
+        """Long-lived per-thread read txn, reopened every txn_refresh_interval lookups so it
+        doesn't pin an old snapshot forever."""
+        txn = getattr(self._local, "standing_txn", None)
+        lookups = getattr(self._local, "standing_lookups", 0)
+        stale = getattr(self._local, "standing_generation", None) != self._txn_generation
+        if txn is None or stale or lookups >= self.txn_refresh_interval:
+            if txn is not None:
+                txn.abort()
+            txn = self.env.begin(buffers=True)
+            self._local.standing_txn = txn
+            self._local.standing_casefold_db = self._casefold_db
+            self._local.standing_generation = self._txn_generation
+            lookups = 0
+        self._local.standing_lookups = lookups + 1
+        return txn
+
+    def refresh(self):
+        """Reopen the index and make every thread's next lookup start a new read txn, e.g. after
+        the index was rebuilt (build_index.py replaces the directory) or the R2 copy changed.
+        Cached locations and pages are dropped too.
+
+        The old env isn't closed: open read_txn() blocks and standing txns keep it alive, and
+        their snapshot, until they finish.
+        """
+        if self.is_cloud:
+            # Downloads the index again only if its ETag changed, then reopens it
+            self._download_index_file()
+        else:
+            self.env = self._open_env(self.db_path)
+        self._casefold_db = self._open_casefold_db()
+        self._txn_generation += 1
+        self._location_cache.clear()
+        self._page_cache.clear()
+        self._shard_index_cache.clear()
+        self._shard_map_cache.clear()
 
     def _setup_s3_client(self):
         """Setup S3-compatible client for R2 access."""
@@ -58,58 +293,91 @@ class WikiData:
         if not all([account_id, access_key, secret_key]):
             raise ValueError("R2 credentials not found. Please set R2_ACCOUNT_ID, R2_ACCESS_KEY_ID, and R2_SECRET_ACCESS_KEY environment variables")
 
-        endpoint_url = f"https://{account_id}.r2.cloudflarestorage.com"
-
-        self.s3_client = boto3.client(
-            's3',
-            region_name="auto",
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            config=Config(signature_version='s3v4')
-        )
+        key = (account_id, access_key, secret_key)
+        with _S3_CLIENT_LOCK:
+            client = _S3_CLIENT_CACHE.get(key)
+            if client is None:
+                # The pool must be at least as large as the multipart download's concurrency
+                client = boto3.Session().client(
+                    's3',
+                    region_name="auto",
+                    endpoint_url=f"https://{account_id}.r2.cloudflarestorage.com",
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    config=Config(
+                        signature_version='s3v4',
+                        max_pool_connections=32,
+                        retries={'mode': 'adaptive', 'max_attempts': 5},
+                        tcp_keepalive=True,
+                    ),
+                )
+                _S3_CLIENT_CACHE[key] = client
+        self.s3_client = client
 
     def _download_index_file(self):
-        """Download the LMDB index directory from R2 to a temporary location."""
-        parsed = urlparse(self.db_path)
-        bucket = parsed.netloc
-        base_key = parsed.path.lstrip('/')
+        """Download the LMDB index from R2 into a local cache keyed on the object's ETag.
 
-        # Remove the .lmdb extension if present to get the directory path
-        # if base_key.endswith('.lmdb'):
-        #     base_key = base_key[:-5]  # Remove '.lmdb'
+        Later instances (and processes) reuse the cached copy while the remote index is unchanged,
+        so only the first one pays for the download.
+        """
+        bucket = self._r2_bucket
+        data_key = f"{self._r2_base}/data.mdb"
 
-        # Create a temporary directory for the LMDB files
-        self._temp_db_path = tempfile.mkdtemp(suffix='_lmdb')
+        key_hash = hashlib.sha256(f"{bucket}/{data_key}".encode("utf-8")).hexdigest()[:16]
+        cache_dir = os.path.join(self._index_cache_dir(), key_hash)
+        data_path = os.path.join(cache_dir, 'data.mdb')
+        etag_path = os.path.join(cache_dir, '.etag')
 
         try:
-            # Download both data.mdb and lock.mdb files
-            data_key = f"{base_key}/data.mdb"
-            lock_key = f"{base_key}/lock.mdb"
-
-            data_path = os.path.join(self._temp_db_path, 'data.mdb')
-            lock_path = os.path.join(self._temp_db_path, 'lock.mdb')
-
-            # Download data.mdb (required)
-            print(f"Downloading {data_key}, {data_path}")
-            self.s3_client.download_file(bucket, data_key, data_path)
-
-            # Download lock.mdb (optional, may not exist in read-only scenarios)
-            try:
-                print(f"Downloading {lock_key}, {lock_path}")
-                self.s3_client.download_file(bucket, lock_key, lock_path)
-            except Exception:
-                # Create an empty lock file if it doesn't exist
-                with open(lock_path, 'wb') as f:
-                    pass
-
-            self.env = lmdb.open(self._temp_db_path, readonly=True)
+            etag = self.s3_client.head_object(Bucket=bucket, Key=data_key)['ETag'].strip('"')
+            cached_etag = None
+            if os.path.exists(data_path) and os.path.exists(etag_path):
+                with open(etag_path) as f:
+                    cached_etag = f.read()
+
+            if cached_etag == etag:
+                print(f"Using cached {data_key}, {data_path}")
+            else:
+                os.makedirs(cache_dir, exist_ok=True)
+                # Download beside the final path and rename it into place, so readers never see a
+                # partial data.mdb. It can be several GB, so fetch it as parallel ranged GETs.
+                fd, part_path = tempfile.mkstemp(dir=cache_dir, suffix='.part')
+                os.close(fd)
+                try:
+                    print(f"Downloading {data_key}, {data_path}")
+                    self.s3_client.download_file(
+                        bucket, data_key, part_path, Config=self._index_transfer_config()
+                    )
+                    os.replace(part_path, data_path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.unlink(part_path)
+                with open(etag_path, 'w') as f:
+                    f.write(etag)
+
+            # lock.mdb isn't needed: the env is opened with lock=False
+            self.env = self._open_env(cache_dir)
         except Exception as e:
-            if os.path.exists(self._temp_db_path):
-                import shutil
-                shutil.rmtree(self._temp_db_path, ignore_errors=True)
             raise RuntimeError(f"Failed to download LMDB directory from {self.db_path}: {e}")
 
+    @staticmethod
+    def _index_cache_dir() -> str:
+        """Directory holding downloaded R2 indexes ($XDG_CACHE_HOME/wiki-game)."""
+        cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_home, "wiki-game")
+
+    @staticmethod
+    def _index_transfer_config() -> "TransferConfig":
+        """Multipart download settings for the index. WIKI_S3_CONCURRENCY and WIKI_S3_CHUNK (bytes)
+        override the defaults of 16 threads and 16 MiB chunks."""
+        chunk_size = int(os.getenv("WIKI_S3_CHUNK", 16 * 1024 * 1024))
+        return TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=chunk_size,
+            max_concurrency=int(os.getenv("WIKI_S3_CONCURRENCY", 16)),
+            use_threads=True,
+        )
+
     def _parse_r2_path(self, location: str) -> Tuple[str, str]:
         """Parse a location path to extract R2 bucket and key.
 
@@ -119,17 +387,10 @@ class WikiData:
         Returns:
             Tuple of (bucket, key) for R2 access
         """
-        # Extract the base path from the original db_path to construct the data path
-        parsed_db = urlparse(self.db_path)
-        bucket = parsed_db.netloc
-
-        # The location is relative to the index, so we need to construct the full path
-        # e.g., if db_path is r2://wiki-data/2025-06-01/index.lmdb
-        # and location is "2025-06-01/AA/wiki_01"
-        # then the key should be "2025-06-01/AA/wiki_01"
-        key = location
-
-        return bucket, key
+        # The location is relative to the bucket the index lives in, e.g. if db_path is
+        # r2://wiki-data/2025-06-01/index.lmdb and location is "2025-06-01/AA/wiki_01",
+        # then the key is "2025-06-01/AA/wiki_01"
+        return self._r2_bucket, location
 
     def get_article_location(self, article: str) -> Tuple[str, str]:
         """Get the location of an article in the dataset.
@@ -141,114 +402,353 @@ class WikiData:
             The location path of the article (e.g., "2025-06-01/AA/wiki_01") and the variation that worked
             or ArticleNotFound if the article is not found
         """
-        try:
-            with self.env.begin() as txn:
-                # Try exact match first
-                location_bytes = txn.get(article.encode("utf-8"))
-                if location_bytes is not None:
-                    return location_bytes.decode("utf-8"), article
-
-                # Try fallback variations if exact match fails
-                fallback_variations = self._get_case_fallbacks(article)
+        result = self._location_cache.get(article)
+        if result is None:
+            entry, variation = self._get_index_entry(article)
+            result = (entry.split(_LOCATION_SEP_BYTES, 1)[0].decode("utf-8"), variation)
+            self._location_cache.put(article, result)
+        return result
+
+    def _get_index_entry(self, article: str) -> Tuple[bytes, str]:
+        """Get the raw index value for an article (including any byte span) and the variation that
+        worked. Raises ArticleNotFound if the article is not found."""
+        key = article.encode("utf-8")
+        # LMDB rejects empty or oversized keys, and the casefold sub-database name is not an article
+        if not key or len(key) > self.env.max_key_size() or key == CASEFOLD_DB:
+            raise ArticleNotFound(f"Article '{article}' not found in DB.")
 
-                for variation in fallback_variations:
-                    location_bytes = txn.get(variation.encode("utf-8"))
+        txn_context, casefold_db = self._begin()
+        with txn_context as txn:
+            # Try exact match first
+            location_bytes = txn.get(key)
+            if location_bytes is not None:
+                return bytes(location_bytes), article
+
+            if casefold_db is not None:
+                # One probe of the casefold index replaces the case-variation chain
+                canonical = txn.get(article.lower().encode("utf-8"), db=casefold_db)
+                if canonical is not None:
+                    canonical = bytes(canonical)
+                    location_bytes = txn.get(canonical)
                     if location_bytes is not None:
-                        return location_bytes.decode("utf-8"), variation
+                        return bytes(location_bytes), canonical.decode("utf-8")
+            else:
+                # Case fallbacks are only built (and memoized) once the exact match misses
+                for key, variation in self._fallback_keys(article):
+                    location_bytes = txn.get(key)
+                    if location_bytes is not None:
+                        return bytes(location_bytes), variation
 
-                # No match found in any variation
-                raise Exception
-        except Exception:
-            raise ArticleNotFound(f"Article '{article}' not found in DB.")
+        raise ArticleNotFound(f"Article '{article}' not found in DB.")
 
-    def _get_case_fallbacks(self, article: str) -> list[str]:
-        """Generate case fallback variations for an article name.
+    def exists(self, article: str) -> bool:
+        """Check whether an article (or one of its case fallbacks) is in the index.
+
+        Only the LMDB index is consulted, so the article's JSONL file is never read.
+        """
+        try:
+            self.get_article_location(article)
+        except ArticleNotFound:
+            return False
+        return True
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _fallback_keys(article: str) -> tuple[tuple[bytes, str], ...]:
+        """UTF-8 encoded index keys for an article's case fallbacks, paired with the variation each
+        one stands for, in priority order. Results are memoized."""
+        if article.isascii():
+            # bytes case methods are ASCII-only, which matches str for ASCII titles, so the
+            # variations are built on the encoded key directly
+            fallbacks = WikiData._get_case_fallbacks(article.encode("ascii"))
+            return tuple((key, key.decode("ascii")) for key in fallbacks)
+        return tuple((v.encode("utf-8"), v) for v in WikiData._get_case_fallbacks(article))
+
+    @staticmethod
+    def _get_case_fallbacks(article: AnyStr) -> tuple[AnyStr, ...]:
+        """Generate case fallback variations for an article name (as str or ASCII bytes).
 
         Args:
             article: The original article name
 
         Returns:
-            List of case variations to try, in priority order
+            Case variations to try, in priority order
         """
         if not article:
-            return []
-
+            return ()
+
+        candidates = (
+            # Capitalized first letter (most common Wikipedia format)
+            article[:1].upper() + article[1:].lower(),
+            article.title(),
+            article.lower(),
+            article.upper(),
+        )
+        # Titles that are already in one of these forms collapse to fewer variations
+        seen = {article}
         fallbacks = []
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                fallbacks.append(candidate)
+        return tuple(fallbacks)
 
-        # Capitalized first letter (most common Wikipedia format)
-        capitalized = (
-            article[0].upper() + article[1:].lower() if len(article) > 1 else article.upper()
-        )
-        if capitalized != article:
-            fallbacks.append(capitalized)
+    def get_page(self, article_title: str) -> Page:
+        """Fetches a page object from LMDB. Throws an ArticleNotFoundError if the article isn't in DB.
 
-        # Title case
-        title_cased = article.title()
-        if title_cased != article and title_cased != capitalized:
-            fallbacks.append(title_cased)
+        Pages are served from an LRU cache when possible. Each call returns its own shallow copy, so
+        callers can reassign fields (e.g. `links`) without affecting the cached page.
+        """
+        page = self._page_cache.get(article_title)
+        if page is None:
+            page = self._load_page(article_title)
+            self._page_cache.put(article_title, page)
+        return page.model_copy()
+
+    def get_page_light(self, article_title: str) -> Page:
+        """Like `get_page`, but the returned page's `content` is empty. For callers that only need
+        the url, title or links.
+
+        Only the record's title, url and links are decoded; the article body is skipped over.
+        Pages that aren't cached are loaded without being added to the page cache, so it isn't
+        filled with pages that have no content.
+        """
+        page = self._page_cache.get(article_title)
+        if page is not None:
+            return page.model_copy(update={"content": ""})
+        entry, article_title = self._get_index_entry(article_title)
+        record = self._record_from_entry(entry, article_title, loads=_loads_without_text)
+        return self._page_from_record(record)
+
+    def get_pages_many(self, titles: Iterable[str], max_workers: int = 8) -> list[Page]:
+        """Fetches several pages at once, in the order of `titles`. Titles that aren't in the DB
+        are skipped.
+
+        All index lookups share one read transaction. Articles that would each need a full scan of
+        their JSONL file are grouped by file so every file is scanned once, and files are read in
+        parallel by up to `max_workers` threads. Loaded pages go through the page cache as usual.
+        """
+        titles = list(titles)
+        pages = {}
+        jobs = []
+        # location -> canonical title -> requested titles, for files that have to be scanned
+        scans = defaultdict(lambda: defaultdict(list))
+        with self.read_txn():
+            for title in dict.fromkeys(titles):
+                page = self._page_cache.get(title)
+                if page is not None:
+                    pages[title] = page
+                    continue
+                try:
+                    entry, canonical = self._get_index_entry(title)
+                except ArticleNotFound:
+                    continue
+                location, _, span = entry.partition(_LOCATION_SEP_BYTES)
+                if span or (not self.is_cloud and self._shard_index_cache.maxsize > 0):
+                    jobs.append((self._load_one, (title, entry, canonical)))
+                else:
+                    scans[location][canonical].append(title)
+        jobs.extend((self._load_scanned, (location, wanted)) for location, wanted in scans.items())
 
-        # Lowercase version
-        lowercase = article.lower()
-        if lowercase != article and lowercase != title_cased:
-            fallbacks.append(lowercase)
+        if len(jobs) > 1 and max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+                results = list(executor.map(lambda job: job[0](*job[1]), jobs))
+        else:
+            results = [fn(*args) for fn, args in jobs]
 
-        # Uppercase version
-        uppercase = article.upper()
-        if uppercase != article and uppercase != capitalized and uppercase != lowercase:
-            fallbacks.append(uppercase)
+        for loaded in results:
+            for title, page in loaded:
+                self._page_cache.put(title, page)
+                pages[title] = page
+        return [pages[title].model_copy() for title in titles if title in pages]
 
-        return fallbacks
+    def _load_one(self, title: str, entry: bytes, canonical: str) -> list[Tuple[str, Page]]:
+        """`get_pages_many` job reading one article on its own; a stale index entry is skipped."""
+        try:
+            return [(title, self._page_from_entry(entry, canonical))]
+        except ArticleNotFound:
+            return []
 
-    def get_page(self, article_title: str) -> Page:
-        """Fetches a page object from LMDB. Throws an ArticleNotFoundError if the article isn't in DB."""
-        location, article_title = self.get_article_location(article_title)
-        # Transform path if needed
+    def _load_scanned(self, location: bytes, wanted: dict) -> list[Tuple[str, Page]]:
+        """`get_pages_many` job scanning one JSONL file for several articles. `wanted` maps each
+        canonical title to the titles it was requested as."""
+        location = self._resolve_location(location)
+        if self.is_cloud:
+            records = self._read_cloud_file(location, wanted.keys())
+        else:
+            records = self._scan_jsonl(_iter_lines(self._shard_map(location)), wanted.keys())
+        return [
+            (title, self._page_from_record(records[canonical]))
+            for canonical, requested in wanted.items()
+            if canonical in records
+            for title in requested
+        ]
+
+    def _load_page(self, article_title: str) -> Page:
+        """Reads a page from the index or its JSONL file, bypassing the page cache."""
+        entry, article_title = self._get_index_entry(article_title)
+        return self._page_from_entry(entry, article_title)
+
+    def _resolve_location(self, location: bytes) -> str:
+        """Decode a location from the index, applying the path transformer if there is one."""
+        location = location.decode("utf-8")
         if self.path_transformer:
             location = self.path_transformer(location)
+        return location
+
+    def _page_from_entry(self, entry: bytes, article_title: str) -> Page:
+        """Builds the page for an index entry, reading its JSONL file if the page isn't embedded."""
+        return self._page_from_record(self._record_from_entry(entry, article_title))
+
+    def _record_from_entry(
+        self, entry: bytes, article_title: str, loads: Callable[[bytes], dict] = orjson.loads
+    ) -> dict:
+        """Parsed JSONL record for an index entry, decoded with `loads`. Raises ArticleNotFound if
+        it isn't there."""
+        location, _, span = entry.partition(_LOCATION_SEP_BYTES)
+        location = self._resolve_location(location)
 
         # Read the JSONL at that location and construct a page object
-        if self.is_cloud:
-            page_data = self._read_cloud_file(location)
+        if span.startswith(ZSTD_MAGIC):
+            # The page is embedded in the index value, so no file is read at all
+            record = loads(zstandard.decompress(span))
+        elif span:
+            # The index knows where the article's line is, so only that line is read and parsed
+            offset, length = map(int, span.split(_LOCATION_SEP_BYTES))
+            record = self._read_line(location, offset, length, loads)
+        elif self.is_cloud:
+            record = self._read_cloud_file(location, (article_title,), loads).get(article_title)
+        elif self._shard_index_cache.maxsize > 0:
+            # Index the whole file once, then every lookup in it reads a single line
+            span = self._shard_offsets(location).get(article_title)
+            record = self._read_line(location, *span, loads) if span else None
         else:
-            with open(location, "r", encoding="utf-8") as file:
-                page_data = [json.loads(line) for line in file]
+            lines = _iter_lines(self._shard_map(location))
+            record = self._scan_jsonl(lines, (article_title,), loads).get(article_title)
+
+        if record is None or record.get("title") != article_title:
+            raise ArticleNotFound(f"Article '{article_title}' not found in DB.")
+        return record
 
+    @staticmethod
+    def _page_from_record(record: dict) -> Page:
+        """Builds a Page from a parsed JSONL record."""
         try:
-            article_data = next(filter(lambda x: x["title"] == article_title, page_data))
-            return Page(
-                url=article_data["url"],
-                title=article_data["title"],
-                content=article_data["text"],
-                links=article_data["links"],
+            # Trusted data from our own index, so skip pydantic validation of the (long) links list.
+            # Titles and links are interned: cached pages share one string per popular link target.
+            return Page.model_construct(
+                url=record["url"],
+                title=sys.intern(record["title"]),
+                content=record["text"],
+                links=[sys.intern(link) for link in record["links"]],
             )
-        except StopIteration:
-            raise ArticleNotFound(f"Article '{article_title}' not found in DB.")
         except Exception:
             raise RuntimeError("An unknown error occurred.")
 
-    def _read_cloud_file(self, location: str) -> list:
-        """Read a JSONL file from R2 cloud storage.
+    @staticmethod
+    def _scan_jsonl(
+        lines: Iterable[bytes], titles: Iterable[str], loads: Callable[[bytes], dict] = orjson.loads
+    ) -> dict:
+        """Parse JSONL lines with `loads` until a record for each of `titles` is found.
+
+        Returns a map of title -> record for the titles present. Lines that can't contain any of
+        the titles are skipped without being parsed, so a malformed line or a record without a
+        title only raises if it could have held one of them.
+        """
+        wanted = set(titles)
+        needles = [_title_needle(title) for title in wanted]
+        if None in needles:
+            needles = None
+        found = {}
+        for line in lines:
+            if not line.strip() or (needles is not None and not any(n in line for n in needles)):
+                continue
+            record = loads(line)
+            title = _record_title(record)
+            if title in wanted:
+                found[title] = record
+                wanted.discard(title)
+                if not wanted:
+                    break
+        return found
+
+    def _shard_offsets(self, location: str) -> dict:
+        """Map of title -> (byte offset, byte length) for every record in a local JSONL file, built
+        with one pass over the file on first use and then served from memory."""
+        offsets = self._shard_index_cache.get(location)
+        if offsets is None:
+            offsets = {}
+            offset = 0
+            for line in _iter_lines(self._shard_map(location)):
+                if line.strip():
+                    title = _record_title(orjson.loads(line))
+                    offsets.setdefault(title, (offset, len(line)))
+                offset += len(line)
+            self._shard_index_cache.put(location, offsets)
+        return offsets
+
+    def _read_line(
+        self,
+        location: str,
+        offset: int,
+        length: int,
+        loads: Callable[[bytes], dict] = orjson.loads,
+    ) -> dict:
+        """Read a single JSONL line given its byte span within the file, parsed with `loads`."""
+        if self.is_cloud:
+            bucket, key = self._parse_r2_path(location)
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}"
+                )
+                line = response['Body'].read()
+            except Exception as e:
+                raise RuntimeError(f"Failed to read file from R2: {bucket}/{key} - {e}")
+        else:
+            line = self._shard_map(location)[offset:offset + length]
+        return loads(line)
+
+    def _shard_map(self, location: str):
+        """Read-only memory map of a local JSONL file, kept in an LRU so hot files are read without
+        reopening them.
+
+        Evicted maps aren't closed explicitly, since another thread may still be reading one; the
+        mapping is released once its last reference is dropped.
+        """
+        shard_map = self._shard_map_cache.get(location)
+        if shard_map is None:
+            with open(location, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    # Empty files can't be mapped
+                    shard_map = b""
+                else:
+                    shard_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._shard_map_cache.put(location, shard_map)
+        return shard_map
+
+    def _read_cloud_file(
+        self, location: str, titles: Iterable[str], loads: Callable[[bytes], dict] = orjson.loads
+    ) -> dict:
+        """Stream a JSONL file from R2 cloud storage until the records for `titles` are found.
 
         Args:
             location: The file location path
+            titles: Titles of the records to find
+            loads: Parser for each candidate line
 
         Returns:
-            List of parsed JSON objects from the file
+            Map of title -> parsed record for the titles found in the file
         """
         bucket, key = self._parse_r2_path(location)
 
         try:
-            # Download file content as string
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            content = response['Body'].read().decode('utf-8')
-
-            # Parse JSONL content
-            page_data = []
-            for line in content.strip().split('\n'):
-                if line.strip():
-                    page_data.append(json.loads(line))
-
-            return page_data
+            # Lines are parsed as they arrive and the download stops at the match, so the whole
+            # object is never buffered
+            body = self.s3_client.get_object(Bucket=bucket, Key=key)['Body']
+            try:
+                return self._scan_jsonl(body.iter_lines(chunk_size=1 << 16), titles, loads)
+            finally:
+                body.close()
         except Exception as e:
             raise RuntimeError(f"Failed to read file from R2: {bucket}/{key} - {e}")
 
@@ -256,17 +756,15 @@ class WikiData:
         """Clean up the LMDB environment on object destruction."""
         if hasattr(self, "env"):
             self.env.close()
-        # Clean up temporary index directory if it exists
-        if hasattr(self, "_temp_db_path") and self._temp_db_path and os.path.exists(self._temp_db_path):
-            try:
-                if os.path.isdir(self._temp_db_path):
-                    shutil.rmtree(self._temp_db_path, ignore_errors=True)
-                else:
-                    os.unlink(self._temp_db_path)
-            except OSError:
-                pass  # Ignore cleanup errors
-
-if __name__=='__main__':
-    db = WikiData("r2://wiki-data/2025-06-01/index.lmdb", lambda x: x.replace("../", ""))
-    page = db.get_page("Anarchy")
-    print(page.content)
+        # Downloaded R2 indexes are kept in the ETag-keyed cache for reuse, so nothing to delete
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print an article's content from a wiki index")
+    parser.add_argument('--db', required=True, help="LMDB index path or r2://bucket/key URL")
+    parser.add_argument('--article', required=True, help="Article title to look up")
+    args = parser.parse_args()
+
+    db = WikiData(args.db, lambda x: x.replace("../", ""))
+    print(db.get_page(args.article).content)
@@ -0,0 +1,82 @@
+import os
+
+import lmdb
+import pytest
+
+from src.models import OllamaSupportedModel
+from src.wiki_db import WikiData
+
+
+def open_test_env(path: str, **kwargs) -> lmdb.Environment:
+    """Open an LMDB env for writing test fixtures. The data is throwaway, so skip the fsyncs on
+    every commit and close."""
+    return lmdb.open(
+        path,
+        map_size=1024 * 1024,
+        sync=False,
+        metasync=False,
+        writemap=True,
+        map_async=True,
+        **kwargs,
+    )
+
+
+def write_test_index(path: str, entries: dict[bytes, bytes]):
+    """Write a test index holding `entries` (title -> index value) in one transaction."""
+    env = open_test_env(path)
+    with env.begin(write=True) as txn:
+        txn.cursor().putmulti(entries.items())
+    env.close()
+
+
+@pytest.fixture(scope="session")
+def ollama_server():
+    """Start (or reuse) one Ollama server and pull the test model once per pytest run.
+
+    OllamaClient instances created by the tests then find the server already running, so none of
+    them start or tear down a server of their own. The tests are skipped if Ollama can't be
+    started or SKIP_OLLAMA_TESTS is set.
+    """
+    from src.clients import OllamaClient
+
+    if os.getenv("SKIP_OLLAMA_TESTS"):
+        pytest.skip("SKIP_OLLAMA_TESTS is set")
+    try:
+        client = OllamaClient(OllamaSupportedModel.QWEN3_0_6B)
+    except (OSError, RuntimeError, ValueError) as e:
+        # No API key, no ollama binary, a server that won't start, or a model that won't pull
+        pytest.skip(f"Ollama unavailable: {e}")
+    yield client.server_url
+    # No-op if the server was already running before the session started
+    client.terminate_ollama_process()
+
+
+@pytest.fixture(scope="session")
+def shared_wiki_db(tmp_path_factory):
+    """Path to one read-only LMDB index shared by the location lookup tests, so each of them
+    doesn't build its own. Tests that write to the index or need particular shard files still
+    create their own."""
+    db_path = str(tmp_path_factory.mktemp("shared") / "test.lmdb")
+    entries = {
+        "Python": "2025-06-01/AA/wiki_01",
+        "Machine Learning": "2025-06-01/ML/wiki_42",
+        "Café": "2025-06-01/CC/wiki_15",
+        "北京": "2025-06-01/ZH/wiki_88",
+        "Test Article": "2025-06-01/TT/wiki_99",
+    }
+    write_test_index(
+        db_path, {title.encode("utf-8"): loc.encode("utf-8") for title, loc in entries.items()}
+    )
+    return db_path
+
+
+@pytest.fixture(scope="session")
+def shared_wiki_data(shared_wiki_db):
+    """One WikiData over `shared_wiki_db` for the whole session, so the env is opened once.
+
+    Its location and page caches are disabled, so every test's lookups still go to LMDB rather
+    than being answered from an earlier test's results.
+    """
+    wiki_data = WikiData(shared_wiki_db, page_cache_size=0, location_cache_size=0)
+    yield wiki_data
+    wiki_data.env.close()
@@ -0,0 +1,73 @@
+import json
+import os
+
+import lmdb
+import orjson
+import zstandard
+
+from scripts import build_index
+from scripts.build_index import add_embedded_pages, add_line_offsets
+
+
+def test_add_line_offsets_skips_blank_lines(tmp_path):
+    """Test that blank lines don't fail the build and still count towards later offsets."""
+    lines = [
+        "\n",
+        json.dumps({"title": "First", "text": "a", "links": []}) + "\n",
+        "  \n",
+        json.dumps({"title": "Second", "text": "b", "links": []}) + "\n",
+    ]
+    (tmp_path / "wiki_01").write_text("".join(lines))
+
+    entries = {b"First": b"wiki_01", b"Second": b"wiki_01"}
+    add_line_offsets(entries, str(tmp_path))
+
+    assert entries == {
+        b"First": b"wiki_01\x1f1\x1f%d" % len(lines[1]),
+        b"Second": b"wiki_01\x1f%d\x1f%d" % (1 + len(lines[1]) + 3, len(lines[3])),
+    }
+
+
+def test_add_embedded_pages_skips_blank_lines(tmp_path):
+    """Test that blank lines don't fail the build when embedding pages."""
+    record = {"title": "First", "url": "u", "text": "a", "links": ["B"]}
+    (tmp_path / "wiki_01").write_text("\n" + json.dumps(record) + "\n\n")
+
+    entries = {b"First": b"wiki_01"}
+    add_embedded_pages(entries, str(tmp_path))
+
+    location, _, blob = entries[b"First"].partition(b"\x1f")
+    assert location == b"wiki_01"
+    assert orjson.loads(zstandard.decompress(blob)) == record
+
+
+def test_convert_json_to_lmdb_streams_plain_index(tmp_path, monkeypatch):
+    """Test that a plain index is written in batches straight from the JSON stream."""
+    index = {f"Article {i}": f"wiki_{i % 3:02d}" for i in range(10)}
+    json_path = tmp_path / "index.json"
+    json_path.write_text(json.dumps(index))
+    lmdb_path = str(tmp_path / "index.lmdb")
+
+    monkeypatch.setattr(build_index, "STREAM_BATCH_SIZE", 3)
+    build_index.convert_json_to_lmdb(str(json_path), lmdb_path, map_size=64 * 1024 * 1024)
+
+    # data.mdb holds only the written pages, not the whole map
+    assert os.path.getsize(os.path.join(lmdb_path, "data.mdb")) < 1024 * 1024
+
+    env = lmdb.open(lmdb_path, readonly=True, lock=False)
+    with env.begin() as txn:
+        written = {key.decode(): value.decode() for key, value in txn.cursor()}
+    env.close()
+    assert written == index
+
+
+def test_convert_json_to_lmdb_counts_articles_with_casefold(tmp_path, capsys):
+    """Test that the verification count leaves out the casefold sub-database's record."""
+    json_path = tmp_path / "index.json"
+    json_path.write_text(json.dumps({"Python": "wiki_01", "NASA": "wiki_02"}))
+
+    build_index.convert_json_to_lmdb(
+        str(json_path), str(tmp_path / "index.lmdb"), map_size=1024 * 1024, with_casefold=True
+    )
+
+    assert "Database contains 2 entries" in capsys.readouterr().out
@@ -0,0 +1,151 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.clients import BaseModelClient, CircuitBreaker
+from src.models import Page
+
+
+class StubClient(BaseModelClient):
+    def __init__(self):
+        super().__init__("stub", "stub-model")
+        self.lm = Mock()
+
+    def _is_supported_model(self, model_name: str) -> bool:
+        return True
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker rejects calls once the failure threshold is reached."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        """Test that a success clears the consecutive failure count."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow()
+
+    def test_half_open_after_timeout(self):
+        """Test that one trial call is allowed after the timeout and a failure re-opens it."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.allow()
+
+        breaker.reset_timeout = 60
+        breaker.record_failure()
+        assert not breaker.allow()
+
+    def test_half_open_lets_one_concurrent_caller_through(self):
+        """Test that only one of many concurrent callers gets the trial call, until it reports."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        callers = 16
+        barrier = threading.Barrier(callers)
+
+        def allow():
+            barrier.wait()
+            return breaker.allow()
+
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            allowed = list(executor.map(lambda _: allow(), range(callers)))
+        assert allowed.count(True) == 1
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_success()
+        assert all(breaker.allow() for _ in range(callers))
+
+
+class TestBaseModelClientInvoke:
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setenv("STUB_API_KEY", "test-key")
+        return StubClient()
+
+    def test_invoke_fails_fast_when_circuit_open(self, client):
+        """Test that invoke skips the LM and returns a random link once the breaker trips."""
+        page = Page(url="", title="A", content="", links=["B", "C"])
+        client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        with patch("src.clients.get_next_page", side_effect=RuntimeError("rate limited")) as lm_call:
+            for _ in range(3):
+                assert client.invoke(page, "Goal") in page.links
+
+        assert lm_call.call_count == 2
+
+
+class TestOllamaStartup:
+    def test_startup_polls_with_exponential_backoff(self, monkeypatch):
+        """Test that a freshly started server is polled at growing intervals until it answers."""
+        import requests
+
+        from src.clients import OllamaClient
+
+        monkeypatch.setenv("WIKIGAME_DISABLE_TAG_CACHE", "1")
+        client = OllamaClient.__new__(OllamaClient)
+        client.model_name = "qwen3:0.6b"
+        client.server_url = "http://localhost:11434"
+        client.ollama_process = None
+
+        ready = Mock(status_code=200)
+        ready.json.return_value = {"models": [{"name": "qwen3:0.6b"}]}
+        down = requests.exceptions.ConnectionError()
+        client._session = Mock()
+        # Initial probe and three failed polls, then ready; the model check is a GET
+        client._session.head.side_effect = [down, down, down, down, ready]
+        client._session.get.return_value = ready
+
+        with patch("src.clients.subprocess.Popen"), patch("src.clients.time.sleep") as sleep:
+            client.setup_ollama_process()
+
+        assert [call.args[0] for call in sleep.call_args_list] == [0.05, 0.1, 0.2]
+        # The "started" process is a mock, so keep __del__ from trying to kill it
+        client.ollama_process = None
+
+    @pytest.mark.skipif(os.name != "posix", reason="Uses sh and POSIX signals")
+    def test_terminate_process_group_escalates_to_sigkill(self):
+        """Test that a server ignoring SIGTERM is killed once the grace period runs out."""
+        import subprocess
+        import time
+
+        from src.clients import _terminate_process_group
+
+        process = subprocess.Popen(
+            ["sh", "-c", "trap '' TERM; sleep 30"], start_new_session=True
+        )
+        time.sleep(0.1)  # Let the shell install its trap
+
+        start = time.monotonic()
+        _terminate_process_group(process, grace=0.1)
+
+        assert process.poll() is not None
+        assert time.monotonic() - start < 5
+
+    def test_server_ready_falls_back_to_version_endpoint(self):
+        """Test that servers not answering HEAD /api/tags are probed via GET /api/version."""
+        from src.clients import OllamaClient
+
+        client = OllamaClient.__new__(OllamaClient)
+        client.server_url = "http://localhost:11434"
+        client._session = Mock()
+        client._session.head.return_value = Mock(status_code=405)
+        client._session.get.return_value = Mock(status_code=200)
+
+        assert client._server_ready(timeout=1)
+        client._session.get.assert_called_once_with("http://localhost:11434/api/version", timeout=1)
@@ -2,10 +2,13 @@ import unittest
 
 import pytest
 
-from src.clients import OllamaClient, OpenRouterClient
-from src.models import OllamaSupportedModel, OpenRouterSupportedModel, Page
+from src.clients import OllamaClient, SimpleAPIClient
+from src.models import OllamaSupportedModel, OpenRouterSupportedModel, Page, Provider
 
 
+# One worker owns the server under `pytest -n`, instead of every worker starting its own
+@pytest.mark.xdist_group("ollama")
+@pytest.mark.usefixtures("ollama_server")
 class TestOllamaClientIntegration(unittest.TestCase):
     """Integration tests for OllamaClient."""
 
@@ -45,20 +48,20 @@ class TestOllamaClientIntegration(unittest.TestCase):
 
 
 class TestOpenRouterClientIntegration(unittest.TestCase):
-    """Integration tests for OpenRouterClient."""
+    """Integration tests for SimpleAPIClient against OpenRouter."""
 
     def test_openrouter_client_initialization(self):
-        """Test that OpenRouterClient can be initialized with a supported model."""
+        """Test that SimpleAPIClient can be initialized with a supported model."""
         model = OpenRouterSupportedModel.QWEN3_DEEPSEEK_8B
-        client = OpenRouterClient(model)
+        client = SimpleAPIClient(Provider.OPENROUTER, model)
 
         assert client.model_name == model
         assert client.lm is not None
 
     def test_openrouter_client_invoke(self):
-        """Test that OpenRouterClient can invoke a model with a Page and goal."""
+        """Test that SimpleAPIClient can invoke a model with a Page and goal."""
         model = OpenRouterSupportedModel.QWEN3_DEEPSEEK_8B
-        client = OpenRouterClient(model)
+        client = SimpleAPIClient(Provider.OPENROUTER, model)
 
         # Create test page as shown in the example
         page = Page(
@@ -76,9 +79,9 @@ class TestOpenRouterClientIntegration(unittest.TestCase):
         assert result in page.links
 
     def test_openrouter_client_unsupported_model(self):
-        """Test that OpenRouterClient raises an error for unsupported models."""
+        """Test that SimpleAPIClient raises an error for unsupported models."""
         with pytest.raises(ValueError, match="Model .* is not supported by provider"):
-            OpenRouterClient("unsupported-model")
+            SimpleAPIClient(Provider.OPENROUTER, "unsupported-model")
 
 
 if __name__ == "__main__":
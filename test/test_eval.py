@@ -1,12 +1,14 @@
+import asyncio
 import json
 import os
 import tempfile
-from unittest.mock import Mock
+import threading
+from unittest.mock import AsyncMock, Mock, patch
 
-import lmdb
 import pytest
 
-from src.eval import get_next_article
+from conftest import write_test_index
+from src.eval import aget_next_article, get_next_article, run_games_batch
 from src.utils import ArticleNotFound
 from src.models import Page
 from src.wiki_db import WikiData
@@ -45,11 +47,13 @@ class TestGetNextArticle:
             f.write(json.dumps(page_2_data) + "\n")
 
         # Create LMDB index
-        env = lmdb.open(self.db_path, map_size=1024 * 1024)
-        with env.begin(write=True) as txn:
-            txn.put(b"Python (programming language)", self.wiki_file_1.encode())
-            txn.put(b"Machine Learning", self.wiki_file_2.encode())
-        env.close()
+        write_test_index(
+            self.db_path,
+            {
+                b"Python (programming language)": self.wiki_file_1.encode(),
+                b"Machine Learning": self.wiki_file_2.encode(),
+            },
+        )
 
         self.wiki_data = WikiData(self.db_path)
 
@@ -82,6 +86,25 @@ class TestGetNextArticle:
         # Verify invoke was called with current page and goal
         mock_invoke.assert_called_once_with(current_page, "goal")
 
+    def test_get_next_article_goal_on_page_skips_invoke(self):
+        """Test that the goal is taken directly when linked, unless ctrl_f is disabled."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Machine Learning", "Data Science"],
+        )
+        mock_invoke = Mock(return_value="Machine Learning")
+
+        next_page = get_next_article(current_page, "Machine Learning", mock_invoke, self.wiki_data)
+        assert next_page.title == "Machine Learning"
+        mock_invoke.assert_not_called()
+
+        get_next_article(
+            current_page, "Machine Learning", mock_invoke, self.wiki_data, ctrl_f=False
+        )
+        mock_invoke.assert_called_once_with(current_page, "Machine Learning")
+
     def test_get_next_article_not_found_in_index(self):
         """Test when the article returned by invoke is not found in LMDB index."""
         current_page = Page(
@@ -110,10 +133,7 @@ class TestGetNextArticle:
         )
 
         # Add a mapping to non-existent file
-        env = lmdb.open(self.db_path, readonly=False)
-        with env.begin(write=True) as txn:
-            txn.put(b"Nonexistent File Article", b"/nonexistent/path/wiki_99")
-        env.close()
+        write_test_index(self.db_path, {b"Nonexistent File Article": b"/nonexistent/path/wiki_99"})
 
         mock_invoke = Mock(return_value="Nonexistent File Article")
 
@@ -136,10 +156,7 @@ class TestGetNextArticle:
             pass  # Create empty file
 
         # Add mapping to empty file
-        env = lmdb.open(self.db_path, readonly=False)
-        with env.begin(write=True) as txn:
-            txn.put(b"Empty Article", empty_file.encode())
-        env.close()
+        write_test_index(self.db_path, {b"Empty Article": empty_file.encode()})
 
         mock_invoke = Mock(return_value="Empty Article")
 
@@ -147,6 +164,28 @@ class TestGetNextArticle:
         with pytest.raises(ArticleNotFound, match="Article 'Empty Article' not found in DB."):
             get_next_article(current_page, "goal", mock_invoke, self.wiki_data)
 
+    def test_get_next_article_skips_blank_lines(self):
+        """Test that blank lines in a JSONL file are ignored instead of failing the parse."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Spaced Article"],
+        )
+
+        spaced_file = os.path.join(self.data_dir, "spaced_wiki")
+        with open(spaced_file, "w") as f:
+            f.write("\n")
+            f.write(json.dumps({"title": "Spaced Article", "text": "", "url": "", "links": []}))
+            f.write("\n\n")
+
+        write_test_index(self.db_path, {b"Spaced Article": spaced_file.encode()})
+
+        mock_invoke = Mock(return_value="Spaced Article")
+
+        next_page = get_next_article(current_page, "goal", mock_invoke, self.wiki_data)
+        assert next_page.title == "Spaced Article"
+
     def test_get_next_article_malformed_json(self):
         """Test when the wiki file contains malformed JSON."""
         current_page = Page(
@@ -162,10 +201,7 @@ class TestGetNextArticle:
             f.write("invalid json content")
 
         # Add mapping to malformed file
-        env = lmdb.open(self.db_path, readonly=False)
-        with env.begin(write=True) as txn:
-            txn.put(b"Malformed Article", malformed_file.encode())
-        env.close()
+        write_test_index(self.db_path, {b"Malformed Article": malformed_file.encode()})
 
         mock_invoke = Mock(return_value="Malformed Article")
 
@@ -188,10 +224,7 @@ class TestGetNextArticle:
             f.write(json.dumps({"text": "Some content without title", "url": "/wiki/Incomplete", "links": []}) + "\n")
 
         # Add mapping to incomplete file
-        env = lmdb.open(self.db_path, readonly=False)
-        with env.begin(write=True) as txn:
-            txn.put(b"Incomplete Article", incomplete_file.encode())
-        env.close()
+        write_test_index(self.db_path, {b"Incomplete Article": incomplete_file.encode()})
 
         mock_invoke = Mock(return_value="Incomplete Article")
 
@@ -199,6 +232,29 @@ class TestGetNextArticle:
         with pytest.raises(RuntimeError, match="An unknown error occurred."):
             get_next_article(current_page, "goal", mock_invoke, self.wiki_data)
 
+    def test_get_next_article_missing_text_field(self):
+        """Test when the JSON is valid but missing required fields."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Machine Learning"],
+        )
+
+        # Create file with JSON missing the text field
+        incomplete_file = os.path.join(self.data_dir, "incomplete_wiki")
+        with open(incomplete_file, "w") as f:
+            f.write(json.dumps({"title": "Incomplete Article", "url": "/wiki/Incomplete", "links": []}) + "\n")
+
+        # Add mapping to incomplete file
+        write_test_index(self.db_path, {b"Incomplete Article": incomplete_file.encode()})
+
+        mock_invoke = Mock(return_value="Incomplete Article")
+
+        # Should raise RuntimeError because KeyError when accessing missing text field
+        with pytest.raises(RuntimeError, match="An unknown error occurred."):
+            get_next_article(current_page, "goal", mock_invoke, self.wiki_data)
+
     def test_get_next_article_invoke_returns_empty_string(self):
         """Test when invoke function returns empty string."""
         current_page = Page(
@@ -245,10 +301,7 @@ class TestGetNextArticle:
             f.write(json.dumps({"title": "Second Article", "text": "Second content", "url": "/wiki/Second_Article", "links": []}) + "\n")
 
         # Add mapping to multi-line file
-        env = lmdb.open(self.db_path, readonly=False)
-        with env.begin(write=True) as txn:
-            txn.put(b"First Article", multi_file.encode())
-        env.close()
+        write_test_index(self.db_path, {b"First Article": multi_file.encode()})
 
         mock_invoke = Mock(return_value="First Article")
 
@@ -257,3 +310,127 @@ class TestGetNextArticle:
 
         assert next_page.title == "First Article"
         assert "First content" in next_page.content
+
+    def test_aget_next_article_success(self):
+        """Test the async variant awaits ainvoke and looks up the returned link."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Machine Learning"],
+        )
+
+        mock_ainvoke = AsyncMock(return_value="Machine Learning")
+
+        next_page = asyncio.run(
+            aget_next_article(current_page, "goal", mock_ainvoke, self.wiki_data)
+        )
+
+        assert next_page.title == "Machine Learning"
+        mock_ainvoke.assert_awaited_once_with(current_page, "goal")
+
+    def test_aget_next_article_uses_prefetched_page(self):
+        """Test that a page prefetched during the LM call is returned without a second lookup."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Nonexistent Article", "Machine Learning"],
+        )
+
+        mock_ainvoke = AsyncMock(return_value="Machine Learning")
+        get_page = Mock(wraps=self.wiki_data.get_page)
+        self.wiki_data.get_page = get_page
+
+        next_page = asyncio.run(
+            aget_next_article(current_page, "Deep Learning", mock_ainvoke, self.wiki_data)
+        )
+
+        assert next_page.title == "Machine Learning"
+        get_page.assert_called_once_with("Machine Learning")
+
+    def test_aget_next_article_does_not_wait_for_missed_prefetch(self):
+        """Test that a prefetch the model didn't pick is left running instead of awaited."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Deep Sea", "Machine Learning"],
+        )
+        release = threading.Event()
+        get_page = self.wiki_data.get_page
+
+        def slow_get_page(title):
+            if title == "Deep Sea":
+                release.wait(5)
+            return get_page(title)
+
+        self.wiki_data.get_page = slow_get_page
+        mock_ainvoke = AsyncMock(return_value="Machine Learning")
+
+        try:
+            next_page = asyncio.run(
+                asyncio.wait_for(
+                    aget_next_article(current_page, "Deep Learning", mock_ainvoke, self.wiki_data),
+                    timeout=1,
+                )
+            )
+        finally:
+            release.set()
+
+        assert next_page.title == "Machine Learning"
+
+    def test_aget_next_article_invoke_returns_empty_string(self):
+        """Test the async variant validates the returned link."""
+        current_page = Page(
+            url="",
+            title="Python (programming language)",
+            content="Python is a high-level programming language.",
+            links=["Machine Learning"],
+        )
+
+        mock_ainvoke = AsyncMock(return_value="")
+
+        with pytest.raises(ArticleNotFound, match="Invoke function returned empty link"):
+            asyncio.run(aget_next_article(current_page, "goal", mock_ainvoke, self.wiki_data))
+
+    def test_run_games_batch(self):
+        """Test running several games concurrently returns each history in input order."""
+
+        async def ainvoke(page, goal):
+            return page.links[0]
+
+        histories = asyncio.run(
+            run_games_batch(
+                ["Python (programming language)", "Machine Learning"],
+                ["Machine Learning", "Python (programming language)"],
+                ainvoke,
+                self.wiki_data,
+                max_concurrency=1,
+            )
+        )
+
+        assert [[page.title for page in history] for history in histories] == [
+            ["Python (programming language)"],
+            ["Machine Learning"],
+        ]
+
+    def test_run_games_batch_passes_prefetch(self):
+        """Test that the prefetch setting reaches every step of the batched games."""
+
+        async def ainvoke(page, goal):
+            return page.links[0]
+
+        with patch("src.eval._prefetch_candidates", return_value=[]) as candidates:
+            asyncio.run(
+                run_games_batch(
+                    ["Python (programming language)"],
+                    ["Deep Learning"],
+                    ainvoke,
+                    self.wiki_data,
+                    max_steps=1,
+                    prefetch=0,
+                )
+            )
+
+        assert [call.args[2] for call in candidates.call_args_list] == [0]
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+import src.utils
+from src.utils import (
+    get_links_for_entry,
+    parse_files_parallel,
+    parse_single_file,
+    prune_files_parallel,
+    prune_links,
+)
+
+
+class TestGetLinksForEntry:
+    @pytest.fixture(params=[True, False], ids=["selectolax", "regex"])
+    def parser(self, request, monkeypatch):
+        """Run each test against both the selectolax parser and the regex fallback."""
+        if request.param and not src.utils.HAS_SELECTOLAX:
+            pytest.skip("selectolax is not installed")
+        monkeypatch.setattr(src.utils, "HAS_SELECTOLAX", request.param)
+
+    def test_extracts_unique_targets(self, parser):
+        """Test that duplicate links are collapsed and anchor text is ignored."""
+        content = 'See <a href="Python">Python</a> and <a href="Python">the language</a>.'
+        assert get_links_for_entry(content) == ["Python"]
+
+    def test_strips_section_links(self, parser):
+        """Test that section anchors are stripped and pure section links dropped."""
+        content = '<a href="Python#History">history</a> <a href="#See also">see also</a>'
+        assert get_links_for_entry(content) == ["Python"]
+
+    def test_unescapes_content(self, parser):
+        """Test that escaped and percent-encoded links are decoded."""
+        content = "&lt;a href=&quot;Machine%20learning&quot;&gt;ML&lt;/a&gt;"
+        assert get_links_for_entry(content) == ["Machine learning"]
+
+    def test_no_links(self, parser):
+        """Test content without links."""
+        assert get_links_for_entry("Plain text") == []
+
+
+class TestParseAndPrune:
+    def setup_method(self):
+        """Write a small JSONL file in the WikiExtractor output format."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "wiki_00")
+        rows = [
+            {"title": "A", "url": "/wiki/A", "text": '<a href="B">b</a> <a href="Missing">m</a>'},
+            {"title": "B", "url": "/wiki/B", "text": '<a href="A#History">a</a>'},
+            {"title": "Empty", "url": "/wiki/Empty", "text": ""},
+        ]
+        with open(self.path, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def teardown_method(self):
+        """Clean up after each test method."""
+        self.temp_dir.cleanup()
+
+    def read_links(self) -> dict[str, list[str]]:
+        with open(self.path) as f:
+            return {row["title"]: sorted(row["links"]) for row in map(json.loads, f)}
+
+    def test_parse_single_file(self):
+        """Test that links are added and entries without content are dropped."""
+        entries = parse_single_file(self.path)
+
+        assert entries == {"A", "B"}
+        assert self.read_links() == {"A": ["B", "Missing"], "B": ["A"]}
+
+    def test_parse_single_file_dry_run(self):
+        """Test that a dry run doesn't rewrite the file."""
+        with open(self.path) as f:
+            original = f.read()
+
+        assert parse_single_file(self.path, dry_run=True) == {"A", "B"}
+        with open(self.path) as f:
+            assert f.read() == original
+
+    def test_prune_links(self):
+        """Test that links to unknown entries are pruned and totals are reported."""
+        entries = parse_single_file(self.path)
+
+        mapping, total_links, total_links_pruned = prune_links(self.path, entries)
+
+        assert mapping == {"A": self.path, "B": self.path}
+        assert total_links == 2
+        assert total_links_pruned == 1
+        assert self.read_links() == {"A": ["B"], "B": ["A"]}
+
+    def test_parse_and_prune_files_parallel(self):
+        """Test that the process pool helpers match the single-file functions."""
+        other_path = os.path.join(self.temp_dir.name, "wiki_01")
+        with open(other_path, "w") as f:
+            f.write(json.dumps({"title": "C", "url": "/wiki/C", "text": '<a href="A">a</a>'}))
+
+        paths = [self.path, other_path]
+        entries = parse_files_parallel(paths, workers=2)
+        assert entries == [{"A", "B"}, {"C"}]
+
+        results = prune_files_parallel(paths, set().union(*entries), workers=2)
+        assert results == [({"A": self.path, "B": self.path}, 2, 1), ({"C": other_path}, 1, 0)]
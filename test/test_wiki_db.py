@@ -1,106 +1,109 @@
+import io
+import json
 import os
-import tempfile
+import shutil
+from unittest.mock import Mock, patch
 
 import lmdb
 import pytest
+import zstandard
+from botocore.response import StreamingBody
 
+from conftest import open_test_env, write_test_index
 from src.wiki_db import WikiData
 
 
-class TestWikiData:
-    def test_get_article_location_existing_article(self):
-        """Test getting location for an existing article."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
+@pytest.fixture(scope="module")
+def case_fallback_wiki_db(tmp_path_factory):
+    """Path to one index holding titles in every case style, for the case fallback tests."""
+    db_path = str(tmp_path_factory.mktemp("case_fallback") / "test.lmdb")
+    entries = {
+        "   ": "2025-06-01/WS/wiki_01",
+        "\t\n": "2025-06-01/WS/wiki_02",
+        "Machine learning": "2025-06-01/ML/wiki_02",
+        "javascript": "2025-06-01/JS/wiki_01",
+        "html css": "2025-06-01/WEB/wiki_02",
+        "NASA": "2025-06-01/SPACE/wiki_01",
+        "FBI CIA": "2025-06-01/GOV/wiki_02",
+        "Python": "2025-06-01/PY/capitalized",
+        "python": "2025-06-01/PY/lowercase",
+        "JAVA": "2025-06-01/JAVA/uppercase",
+        "java": "2025-06-01/JAVA/lowercase",
+        "A": "2025-06-01/LETTER/wiki_A",
+        "x": "2025-06-01/LETTER/wiki_x",
+        "Café": "2025-06-01/FR/wiki_01",
+        "москва": "2025-06-01/RU/wiki_01",
+    }
+    write_test_index(
+        db_path, {title.encode("utf-8"): loc.encode("utf-8") for title, loc in entries.items()}
+    )
+    return db_path
+
+
+@pytest.fixture(scope="module")
+def case_fallback_wiki_data(case_fallback_wiki_db):
+    """One WikiData over `case_fallback_wiki_db` for the module, with result caching disabled."""
+    wiki_data = WikiData(case_fallback_wiki_db, page_cache_size=0, location_cache_size=0)
+    yield wiki_data
+    wiki_data.env.close()
 
-            # Create a test LMDB database
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"Python", b"2025-06-01/AA/wiki_01")
-                txn.put(b"Machine Learning", b"2025-06-01/ML/wiki_42")
-            env.close()
 
-            # Test the WikiData class
-            wiki_data = WikiData(db_path)
-            location, article = wiki_data.get_article_location("Python")
-            assert location == "2025-06-01/AA/wiki_01"
-            assert article == "Python"
+class TestWikiData:
+    def test_get_article_location_existing_article(self, shared_wiki_data):
+        """Test getting location for an existing article."""
+        wiki_data = shared_wiki_data
+        location, article = wiki_data.get_article_location("Python")
+        assert location == "2025-06-01/AA/wiki_01"
+        assert article == "Python"
 
-            location, article = wiki_data.get_article_location("Machine Learning")
-            assert location == "2025-06-01/ML/wiki_42"
-            assert article == "Machine Learning"
+        location, article = wiki_data.get_article_location("Machine Learning")
+        assert location == "2025-06-01/ML/wiki_42"
+        assert article == "Machine Learning"
 
-    def test_get_article_location_nonexistent_article(self):
+    def test_get_article_location_nonexistent_article(self, shared_wiki_data):
         """Test getting location for a non-existent article."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create empty LMDB database
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            env.close()
-
-            wiki_data = WikiData(db_path)
-            from src.utils import ArticleNotFound
+        wiki_data = shared_wiki_data
+        from src.utils import ArticleNotFound
 
-            with pytest.raises(ArticleNotFound):
-                wiki_data.get_article_location("NonexistentArticle")
+        with pytest.raises(ArticleNotFound):
+            wiki_data.get_article_location("NonexistentArticle")
 
-    def test_get_article_location_case_sensitivity_with_fallback(self):
+    def test_get_article_location_case_sensitivity_with_fallback(self, shared_wiki_data):
         """Test that article lookup now supports case-insensitive fallback."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create a test LMDB database
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"Python", b"2025-06-01/AA/wiki_01")
-            env.close()
+        wiki_data = shared_wiki_data
 
-            wiki_data = WikiData(db_path)
+        # Exact match should work
+        location, article = wiki_data.get_article_location("Python")
+        assert location == "2025-06-01/AA/wiki_01"
+        assert article == "Python"
 
-            # Exact match should work
-            location, article = wiki_data.get_article_location("Python")
-            assert location == "2025-06-01/AA/wiki_01"
-            assert article == "Python"
-
-            # Case variations should now work via fallback
-            location, article = wiki_data.get_article_location("python")
-            assert location == "2025-06-01/AA/wiki_01"
-            assert article == "Python" # The variation that is actually in the DB
+        # Case variations should now work via fallback
+        location, article = wiki_data.get_article_location("python")
+        assert location == "2025-06-01/AA/wiki_01"
+        assert article == "Python" # The variation that is actually in the DB
 
-            location, article = wiki_data.get_article_location("PYTHON")
-            assert location == "2025-06-01/AA/wiki_01"
-            assert article == "Python" # The variation that is actually in the DB
+        location, article = wiki_data.get_article_location("PYTHON")
+        assert location == "2025-06-01/AA/wiki_01"
+        assert article == "Python" # The variation that is actually in the DB
 
-    def test_get_article_location_unicode_handling(self):
+    def test_get_article_location_unicode_handling(self, shared_wiki_data):
         """Test handling of Unicode characters in article names."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create a test LMDB database with Unicode article names
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put("Café".encode("utf-8"), b"2025-06-01/CC/wiki_15")
-                txn.put("北京".encode("utf-8"), b"2025-06-01/ZH/wiki_88")
-            env.close()
+        wiki_data = shared_wiki_data
 
-            wiki_data = WikiData(db_path)
+        location, article = wiki_data.get_article_location("Café")
+        assert location == "2025-06-01/CC/wiki_15"
+        assert article == "Café"
 
-            location, article = wiki_data.get_article_location("Café")
-            assert location == "2025-06-01/CC/wiki_15"
-            assert article == "Café"
+        location, article = wiki_data.get_article_location("北京")
+        assert location == "2025-06-01/ZH/wiki_88"
+        assert article == "北京"
 
-            location, article = wiki_data.get_article_location("北京")
-            assert location == "2025-06-01/ZH/wiki_88"
-            assert article == "北京"
-
-    def test_init_with_nonexistent_db(self):
+    def test_init_with_nonexistent_db(self, tmp_path):
         """Test initialization with a non-existent database path."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "nonexistent.lmdb")
+        db_path = str(tmp_path / "nonexistent.lmdb")
 
-            with pytest.raises(lmdb.Error):
-                WikiData(db_path)
+        with pytest.raises(lmdb.Error):
+            WikiData(db_path)
 
     def test_init_with_invalid_path(self):
         """Test initialization with an invalid path."""
@@ -109,244 +112,536 @@ class TestWikiData:
         with pytest.raises(lmdb.Error):
             WikiData(invalid_path)
 
-    def test_database_connection_context_management(self):
+    def test_database_connection_context_management(self, shared_wiki_data):
         """Test that database connections are properly managed."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create a test LMDB database
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"Test Article", b"2025-06-01/TT/wiki_99")
-            env.close()
-
-            wiki_data = WikiData(db_path)
-
-            # Multiple calls should work without issues
-            location1, article1 = wiki_data.get_article_location("Test Article")
-            location2, article2 = wiki_data.get_article_location("Test Article")
+        wiki_data = shared_wiki_data
 
-            assert location1 == "2025-06-01/TT/wiki_99"
-            assert article1 == "Test Article"
-            assert location2 == "2025-06-01/TT/wiki_99"
-            assert article2 == "Test Article"
+        # Multiple calls should work without issues
+        location1, article1 = wiki_data.get_article_location("Test Article")
+        location2, article2 = wiki_data.get_article_location("Test Article")
 
-            from src.utils import ArticleNotFound
+        assert location1 == "2025-06-01/TT/wiki_99"
+        assert article1 == "Test Article"
+        assert location2 == "2025-06-01/TT/wiki_99"
+        assert article2 == "Test Article"
 
-            with pytest.raises(ArticleNotFound):
-                wiki_data.get_article_location("Nonexistent")
+        from src.utils import ArticleNotFound
 
-    def test_empty_article_name(self):
-        """Test handling of empty article names."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create empty LMDB database
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            env.close()
+        with pytest.raises(ArticleNotFound):
+            wiki_data.get_article_location("Nonexistent")
 
-            wiki_data = WikiData(db_path)
-            from src.utils import ArticleNotFound
+    def test_exists(self, shared_wiki_data):
+        """Test checking article existence without loading the page."""
+        # Locations don't need to exist on disk since exists() never reads them
+        wiki_data = shared_wiki_data
 
-            with pytest.raises(ArticleNotFound):
-                wiki_data.get_article_location("")
-
-    def test_whitespace_article_name(self):
-        """Test handling of whitespace-only article names."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            # Create LMDB database with whitespace entries
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"   ", b"2025-06-01/WS/wiki_01")
-                txn.put(b"\t\n", b"2025-06-01/WS/wiki_02")
-            env.close()
+        assert wiki_data.exists("Python")
+        assert wiki_data.exists("python")  # Via case fallback
+        assert not wiki_data.exists("Nonexistent")
 
-            wiki_data = WikiData(db_path)
+    def test_get_article_location_cached(self, tmp_path):
+        """Test that resolved locations are cached until refresh()."""
+        db_path = str(tmp_path / "test.lmdb")
 
-            # Exact whitespace matches should work
-            location, article = wiki_data.get_article_location("   ")
-            assert location == "2025-06-01/WS/wiki_01"
-            assert article == "   "
+        write_test_index(db_path, {b"Python": b"2025-06-01/AA/wiki_01"})
 
-            location, article = wiki_data.get_article_location("\t\n")
-            assert location == "2025-06-01/WS/wiki_02"
-            assert article == "\t\n"
+        wiki_data = WikiData(db_path)
+        assert wiki_data.get_article_location("python") == ("2025-06-01/AA/wiki_01", "Python")
 
-            # Different whitespace should not match
-            from src.utils import ArticleNotFound
+        write_test_index(db_path, {b"Python": b"2025-06-01/BB/wiki_02"})
 
-            with pytest.raises(ArticleNotFound):
-                wiki_data.get_article_location("  ")
+        assert wiki_data.get_article_location("python") == ("2025-06-01/AA/wiki_01", "Python")
+        wiki_data.refresh()
+        assert wiki_data.get_article_location("python") == ("2025-06-01/BB/wiki_02", "Python")
 
-    def test_case_fallback_capitalized(self):
-        """Test fallback to capitalized first letter when exact match fails."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
+    def test_refresh_reopens_rebuilt_index(self, tmp_path):
+        """Test that refresh() picks up an index whose directory was replaced, as build_index.py
+        does, while a txn on the old index keeps its snapshot."""
+        db_path = str(tmp_path / "test.lmdb")
 
-            # Create database with capitalized article
-            env = lmdb.open(db_path, map_size=1024 * 1024)
+        def build(title: bytes, location: bytes):
+            env = open_test_env(db_path, max_dbs=2)
             with env.begin(write=True) as txn:
-                txn.put(b"Python", b"2025-06-01/PY/wiki_01")
-                txn.put(b"Machine learning", b"2025-06-01/ML/wiki_02")
+                txn.put(title, location)
+                txn.put(title.lower(), title, db=env.open_db(b"__casefold__", txn=txn))
             env.close()
 
-            wiki_data = WikiData(db_path)
+        build(b"Python", b"2025-06-01/AA/wiki_01")
+        wiki_data = WikiData(db_path, location_cache_size=0)
 
-            # Lowercase should find capitalized version
-            location, article = wiki_data.get_article_location("python")
-            assert location == "2025-06-01/PY/wiki_01"
-            assert article == "Python"
+        with wiki_data.read_txn():
+            shutil.rmtree(db_path)
+            build(b"iPhone", b"2025-06-01/BB/wiki_02")
+            wiki_data.refresh()
 
-            # Mixed case should find capitalized version
-            location, article = wiki_data.get_article_location("machine learning")
-            assert location == "2025-06-01/ML/wiki_02"
-            assert article == "Machine learning"
+            # Still the old snapshot, with casefold probes going to the old env
+            assert wiki_data.get_article_location("PYTHON") == ("2025-06-01/AA/wiki_01", "Python")
+            assert not wiki_data.exists("IPHONE")
 
-    def test_case_fallback_lowercase(self):
-        """Test fallback to lowercase when exact match and capitalized fail."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
+        assert not wiki_data.exists("PYTHON")
+        assert wiki_data.get_article_location("IPHONE") == ("2025-06-01/BB/wiki_02", "iPhone")
 
-            # Create database with lowercase article
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"javascript", b"2025-06-01/JS/wiki_01")
-                txn.put(b"html css", b"2025-06-01/WEB/wiki_02")
-            env.close()
+    def test_get_article_location_with_casefold_index(self, tmp_path):
+        """Test that case variations resolve through the casefold sub-database when present."""
+        db_path = str(tmp_path / "test.lmdb")
 
-            wiki_data = WikiData(db_path)
+        env = open_test_env(db_path, max_dbs=2)
+        with env.begin(write=True) as txn:
+            txn.put(b"iPhone", b"2025-06-01/AA/wiki_01")
+            casefold_db = env.open_db(b"__casefold__", txn=txn)
+            txn.put(b"iphone", b"iPhone", db=casefold_db)
+        env.close()
 
-            # Uppercase should find lowercase version
-            location, article = wiki_data.get_article_location("JAVASCRIPT")
-            assert location == "2025-06-01/JS/wiki_01"
-            assert article == "javascript"
+        wiki_data = WikiData(db_path)
 
-            # Title case should find lowercase version
-            location, article = wiki_data.get_article_location("Html Css")
-            assert location == "2025-06-01/WEB/wiki_02"
-            assert article == "html css"
+        # "iPhone" isn't one of the fixed case variations of "IPHONE"
+        location, article = wiki_data.get_article_location("IPHONE")
+        assert location == "2025-06-01/AA/wiki_01"
+        assert article == "iPhone"
 
-    def test_case_fallback_uppercase(self):
-        """Test fallback to uppercase when other cases fail."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
+        assert not wiki_data.exists("Android")
+        assert not wiki_data.exists("__casefold__")
 
-            # Create database with uppercase article
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"NASA", b"2025-06-01/SPACE/wiki_01")
-                txn.put(b"FBI CIA", b"2025-06-01/GOV/wiki_02")
-            env.close()
+    def test_get_article_location_oversized_title(self, shared_wiki_data):
+        """Test that titles longer than LMDB's key limit are reported as not found."""
+        wiki_data = shared_wiki_data
 
-            wiki_data = WikiData(db_path)
+        from src.utils import ArticleNotFound
 
-            # Lowercase should find uppercase version
-            location, article = wiki_data.get_article_location("nasa")
-            assert location == "2025-06-01/SPACE/wiki_01"
-            assert article == "NASA"
+        with pytest.raises(ArticleNotFound):
+            wiki_data.get_article_location("Python" * 200)
 
-            # Mixed case should find uppercase version
-            location, article = wiki_data.get_article_location("fbi cia")
-            assert location == "2025-06-01/GOV/wiki_02"
-            assert article == "FBI CIA"
+    def test_read_txn_shared_across_lookups(self, tmp_path):
+        """Test that lookups inside read_txn reuse a single transaction."""
+        db_path = str(tmp_path / "test.lmdb")
 
-    def test_case_fallback_priority_order(self):
-        """Test that fallbacks are tried in the correct priority order."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
+        write_test_index(
+            db_path, {b"Python": b"2025-06-01/PY/wiki_01", b"NASA": b"2025-06-01/SPACE/wiki_01"}
+        )
 
-            # Create database with multiple case variations of same concept
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                # Both capitalized and lowercase exist
-                txn.put(b"Python", b"2025-06-01/PY/capitalized")
-                txn.put(b"python", b"2025-06-01/PY/lowercase")
-                # Both uppercase and lowercase exist
-                txn.put(b"JAVA", b"2025-06-01/JAVA/uppercase")
-                txn.put(b"java", b"2025-06-01/JAVA/lowercase")
-            env.close()
+        wiki_data = WikiData(db_path)
 
-            wiki_data = WikiData(db_path)
+        with wiki_data.read_txn() as txn:
+            with wiki_data.read_txn() as nested_txn:
+                assert nested_txn is txn
 
-            # When searching "python", should prefer "Python" (capitalized) over "python" (lowercase)
             location, article = wiki_data.get_article_location("python")
-            assert location == "2025-06-01/PY/lowercase"  # Exact match wins
-            assert article == "python"
-
-            # When searching "PYTHON", should prefer "Python" (capitalized) over "python" (lowercase)
-            location, article = wiki_data.get_article_location("PYTHON")
-            assert location == "2025-06-01/PY/capitalized"  # Capitalized fallback wins
+            assert location == "2025-06-01/PY/wiki_01"
             assert article == "Python"
 
-            # When searching "Java", should get exact match if it exists
-            # But since "Java" doesn't exist, should get capitalized fallback priority
-            location, article = wiki_data.get_article_location("Java")
-            # Should fall back to lowercase since no exact "Java" or "java" -> "JAVA" priority
-            assert location == "2025-06-01/JAVA/lowercase"
-            assert article == "java"
-
-    def test_case_fallback_single_character(self):
-        """Test case fallback with single character articles."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"A", b"2025-06-01/LETTER/wiki_A")
-                txn.put(b"x", b"2025-06-01/LETTER/wiki_x")
-            env.close()
-
-            wiki_data = WikiData(db_path)
-
-            # Lowercase should find uppercase
-            location, article = wiki_data.get_article_location("a")
-            assert location == "2025-06-01/LETTER/wiki_A"
-            assert article == "A"
-
-            # Uppercase should find lowercase
-            location, article = wiki_data.get_article_location("X")
-            assert location == "2025-06-01/LETTER/wiki_x"
-            assert article == "x"
-
-    def test_case_fallback_no_match_found(self):
-        """Test that ArticleNotFound is raised when no case variations exist."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                txn.put(b"Python", b"2025-06-01/PY/wiki_01")
-            env.close()
-
-            wiki_data = WikiData(db_path)
-
-            # Non-existent article should still raise ArticleNotFound after all fallbacks
-            from src.utils import ArticleNotFound
-
-            with pytest.raises(ArticleNotFound):
-                wiki_data.get_article_location("NonExistentArticle")
-
-    def test_case_fallback_unicode_articles(self):
-        """Test case fallback with Unicode characters."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_path = os.path.join(temp_dir, "test.lmdb")
-
-            env = lmdb.open(db_path, map_size=1024 * 1024)
-            with env.begin(write=True) as txn:
-                # Unicode with different cases
-                txn.put("Café".encode("utf-8"), b"2025-06-01/FR/wiki_01")
-                txn.put("москва".encode("utf-8"), b"2025-06-01/RU/wiki_01")
-            env.close()
-
-            wiki_data = WikiData(db_path)
-
-            # Should find exact Unicode matches through fallbacks
-            location, article = wiki_data.get_article_location("café")
-            assert location == "2025-06-01/FR/wiki_01"
-            assert article == "Café"
+            location, article = wiki_data.get_article_location("NASA")
+            assert location == "2025-06-01/SPACE/wiki_01"
+            assert article == "NASA"
 
-            location, article = wiki_data.get_article_location("МОСКВА")
-            assert location == "2025-06-01/RU/wiki_01"
-            assert article == "москва"
+        # Lookups still work once the shared txn is closed
+        location, article = wiki_data.get_article_location("NASA")
+        assert location == "2025-06-01/SPACE/wiki_01"
+
+    def test_standing_txn_refreshed(self, tmp_path):
+        """Test that lookups outside read_txn reuse a standing txn that is periodically reopened."""
+        db_path = str(tmp_path / "test.lmdb")
+
+        write_test_index(db_path, {b"Python": b"2025-06-01/PY/wiki_01"})
+
+        # Location caching would answer repeat lookups without touching a txn
+        wiki_data = WikiData(db_path, txn_refresh_interval=2, location_cache_size=0)
+
+        wiki_data.get_article_location("Python")
+        first_txn = wiki_data._local.standing_txn
+        wiki_data.get_article_location("Python")
+        assert wiki_data._local.standing_txn is first_txn
+
+        location, _ = wiki_data.get_article_location("Python")
+        assert location == "2025-06-01/PY/wiki_01"
+        assert wiki_data._local.standing_txn is not first_txn
+
+        # refresh() forces a new txn on the next lookup, regardless of the interval
+        second_txn = wiki_data._local.standing_txn
+        wiki_data.refresh()
+        wiki_data.get_article_location("Python")
+        assert wiki_data._local.standing_txn is not second_txn
+
+    def test_get_page_lru_cache(self, tmp_path):
+        """Test that pages are served from the LRU cache and evicted beyond its size."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "w") as f:
+            for title in ["Python", "NASA"]:
+                f.write(
+                    json.dumps({"title": title, "url": "", "text": "", "links": ["A"]}) + "\n"
+                )
+
+        write_test_index(db_path, {b"Python": data_path.encode(), b"NASA": data_path.encode()})
+
+        # Without the shard map cache, every uncached page read opens the file
+        wiki_data = WikiData(db_path, page_cache_size=1, shard_map_cache_size=0)
+
+        page = wiki_data.get_page("Python")
+        # Reassigning fields on a returned page must not leak into the cache
+        page.links = []
+        assert wiki_data.get_page("Python").links == ["A"]
+
+        # Loading another page evicts "Python"
+        wiki_data.get_page("NASA")
+        os.remove(data_path)
+
+        # "NASA" is still served from the cache, "Python" needs the (deleted) file
+        assert wiki_data.get_page("NASA").title == "NASA"
+        with pytest.raises(FileNotFoundError):
+            wiki_data.get_page("Python")
+
+    def test_get_page_reuses_shard_map(self, tmp_path):
+        """Test that a local JSONL file stays mapped between reads instead of being reopened."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "w") as f:
+            for title in ["Python", "NASA"]:
+                f.write(
+                    json.dumps({"title": title, "url": "", "text": "", "links": []}) + "\n"
+                )
+
+        write_test_index(db_path, {b"Python": data_path.encode(), b"NASA": data_path.encode()})
+
+        wiki_data = WikiData(db_path, page_cache_size=0, shard_index_cache_size=0)
+        assert wiki_data.get_page("Python").title == "Python"
+
+        # The mapping outlives the file, so only a refresh() drops it
+        os.remove(data_path)
+        assert wiki_data.get_page("NASA").title == "NASA"
+        wiki_data.refresh()
+        with pytest.raises(FileNotFoundError):
+            wiki_data.get_page("NASA")
+
+    def test_get_page_uses_shard_offsets(self, tmp_path):
+        """Test that later lookups in an already-scanned file read only the article's line."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        lines = [
+            json.dumps({"title": title, "url": "", "text": "", "links": []}).encode() + b"\n"
+            for title in ["Python", "NASA"]
+        ]
+        with open(data_path, "wb") as f:
+            f.writelines(lines)
+
+        write_test_index(db_path, {b"Python": data_path.encode(), b"NASA": data_path.encode()})
+
+        wiki_data = WikiData(db_path, page_cache_size=0)
+        assert wiki_data.get_page("Python").title == "Python"
+
+        # Corrupt the first line in place; a full scan would now fail to parse it
+        with open(data_path, "r+b") as f:
+            f.write(b"x" * (len(lines[0]) - 1))
+
+        assert wiki_data.get_page("NASA").title == "NASA"
+
+    def test_get_page_scan_skips_lines_without_the_title(self, tmp_path):
+        """Test that the file scan only reports bad records on lines that could hold the title."""
+        from src.utils import ArticleNotFound
+
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "w") as f:
+            f.write("invalid json content\n")
+            f.write(json.dumps({"text": "No title here", "url": "u", "links": []}) + "\n")
+            f.write(json.dumps({"text": "About Python", "url": "u", "links": []}) + "\n")
+            f.write(json.dumps({"title": "NASA", "url": "u", "text": "t", "links": []}) + "\n")
+
+        write_test_index(
+            db_path,
+            {b"NASA": data_path.encode(), b"Python": data_path.encode(), b"Go": data_path.encode()},
+        )
+
+        # Without the title index every lookup scans the file, skipping lines by title
+        wiki_data = WikiData(db_path, shard_index_cache_size=0)
+
+        # Neither bad line mentions "NASA" or "Go", so neither is parsed
+        assert wiki_data.get_page("NASA").title == "NASA"
+        with pytest.raises(ArticleNotFound):
+            wiki_data.get_page("Go")
+
+        # The title-less record mentions "Python", so it is parsed and reported
+        with pytest.raises(RuntimeError, match="An unknown error occurred."):
+            wiki_data.get_page("Python")
+
+    def test_get_page_with_escaped_title(self, tmp_path):
+        """Test that titles a JSONL writer may have escaped are still found by the file scan."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "wb") as f:
+            # pandas escapes "/" and writes non-ASCII as \u escapes
+            f.write(b'{"title":"AC\\/DC","url":"","text":"","links":[]}\n')
+            f.write(b'{"title":"Caf\\u00e9","url":"","text":"","links":[]}\n')
+
+        write_test_index(
+            db_path, {b"AC/DC": data_path.encode(), "Café".encode("utf-8"): data_path.encode()}
+        )
+
+        wiki_data = WikiData(db_path)
+
+        assert wiki_data.get_page("AC/DC").title == "AC/DC"
+        assert wiki_data.get_page("Café").title == "Café"
+
+    def test_get_page_streams_cloud_file(self, tmp_path):
+        """Test that R2 files are streamed line by line until the article is found."""
+        db_path = str(tmp_path / "test.lmdb")
+
+        write_test_index(db_path, {b"NASA": b"2025-06-01/AA/wiki_01"})
+
+        content = b"".join(
+            json.dumps({"title": title, "url": "", "text": "", "links": []}).encode() + b"\n"
+            for title in ["Python", "NASA"]
+        ) + b"not json\n"
+        body = StreamingBody(io.BytesIO(content), len(content))
+
+        wiki_data = WikiData(db_path)
+        wiki_data.is_cloud = True
+        wiki_data._r2_bucket = "wiki-data"
+        wiki_data.s3_client = Mock()
+        wiki_data.s3_client.get_object.return_value = {"Body": body}
+
+        # The malformed trailing line is never reached
+        assert wiki_data.get_page("NASA").title == "NASA"
+        wiki_data.s3_client.get_object.assert_called_once_with(
+            Bucket="wiki-data", Key="2025-06-01/AA/wiki_01"
+        )
+
+    def test_download_index_reuses_cached_copy(self, tmp_path, monkeypatch):
+        """Test that an R2 index is downloaded once and reused while its ETag is unchanged."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        source_path = str(tmp_path / "source.lmdb")
+
+        write_test_index(source_path, {b"Python": b"2025-06-01/AA/wiki_01"})
+
+        s3_client = Mock()
+        s3_client.head_object.return_value = {"ETag": '"abc"'}
+        s3_client.download_file.side_effect = lambda bucket, key, path, **kwargs: shutil.copy(
+            os.path.join(source_path, "data.mdb"), path
+        )
+        monkeypatch.setattr(
+            WikiData, "_setup_s3_client", lambda self: setattr(self, "s3_client", s3_client)
+        )
+
+        for _ in range(2):
+            wiki_data = WikiData("r2://wiki-data/2025-06-01/index.lmdb")
+            location, _ = wiki_data.get_article_location("Python")
+            assert location == "2025-06-01/AA/wiki_01"
+        s3_client.download_file.assert_called_once()
+
+        # A new ETag means the remote index changed, so it is fetched again
+        s3_client.head_object.return_value = {"ETag": '"def"'}
+        WikiData("r2://wiki-data/2025-06-01/index.lmdb")
+        assert s3_client.download_file.call_count == 2
+
+    def test_get_pages_many(self, tmp_path):
+        """Test batch loading: input order is kept, missing titles are skipped, and each JSONL
+        file is scanned once for all of its requested articles."""
+        db_path = str(tmp_path / "test.lmdb")
+        shards = {"wiki_01": ["Python", "NASA"], "wiki_02": ["Café"]}
+
+        env = open_test_env(db_path)
+        with env.begin(write=True) as txn:
+            for shard, titles in shards.items():
+                data_path = str(tmp_path / shard)
+                with open(data_path, "w") as f:
+                    for title in titles:
+                        record = {"title": title, "url": "", "text": title, "links": []}
+                        f.write(json.dumps(record) + "\n")
+                        txn.put(title.encode("utf-8"), data_path.encode())
+        env.close()
+
+        wiki_data = WikiData(db_path, shard_index_cache_size=0)
+        scan = Mock(wraps=WikiData._scan_jsonl)
+        wiki_data._scan_jsonl = scan
+
+        pages = wiki_data.get_pages_many(["NASA", "Missing", "Café", "python"])
+
+        assert [page.title for page in pages] == ["NASA", "Café", "Python"]
+        assert [page.content for page in pages] == ["NASA", "Café", "Python"]
+        assert scan.call_count == 2
+
+        # Everything loaded is now served from the page cache
+        assert wiki_data.get_pages_many(["python", "Café"])[0].title == "Python"
+        assert scan.call_count == 2
+
+    def test_setup_s3_client_shared_across_instances(self, monkeypatch):
+        """Test that instances with the same R2 credentials share one boto3 client."""
+        monkeypatch.setenv("R2_ACCOUNT_ID", "account")
+        monkeypatch.setenv("R2_ACCESS_KEY_ID", "access")
+        monkeypatch.setenv("R2_SECRET_ACCESS_KEY", "secret")
+        monkeypatch.setattr("src.wiki_db._S3_CLIENT_CACHE", {})
+
+        first, second = WikiData.__new__(WikiData), WikiData.__new__(WikiData)
+        first._setup_s3_client()
+        second._setup_s3_client()
+        assert first.s3_client is second.s3_client
+
+        monkeypatch.setenv("R2_ACCESS_KEY_ID", "other")
+        third = WikiData.__new__(WikiData)
+        third._setup_s3_client()
+        assert third.s3_client is not first.s3_client
+
+    def test_get_page_interns_links(self, tmp_path):
+        """Test that pages linking to the same article share one link string."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "w") as f:
+            for title in ["Python", "NASA"]:
+                f.write(
+                    json.dumps(
+                        {"title": title, "url": "", "text": "", "links": ["United States"]}
+                    ) + "\n"
+                )
+
+        write_test_index(db_path, {b"Python": data_path.encode(), b"NASA": data_path.encode()})
+
+        wiki_data = WikiData(db_path)
+
+        python_links = wiki_data.get_page("Python").links
+        nasa_links = wiki_data.get_page("NASA").links
+        assert python_links == nasa_links == ["United States"]
+        assert python_links[0] is nasa_links[0]
+
+    def test_get_page_light(self, tmp_path):
+        """Test that light pages drop the content and are kept out of the page cache."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "w") as f:
+            record = {"title": "Python", "url": "u", "text": "Long text", "links": ["A"]}
+            f.write(json.dumps(record) + "\n")
+
+        write_test_index(db_path, {b"Python": data_path.encode()})
+
+        wiki_data = WikiData(db_path)
+
+        page = wiki_data.get_page_light("python")
+        assert (page.title, page.url, page.content, page.links) == ("Python", "u", "", ["A"])
+        assert wiki_data._page_cache.get("python") is None
+
+        assert wiki_data.get_page("python").content == "Long text"
+        assert wiki_data.get_page_light("python").content == ""
+        assert wiki_data.get_page("python").content == "Long text"
+
+    def test_get_page_light_never_decodes_text(self, tmp_path):
+        """Test that light pages are parsed without the text, for every kind of index entry."""
+        from src.wiki_db import _loads_without_text
+
+        record = {"title": "Python", "url": "u", "text": 'Say "hi"\\', "links": ["A", "text"]}
+        line = json.dumps(record).encode() + b"\n"
+        assert _loads_without_text(line) == {**record, "text": ""}
+        # Records missing a field still parse, so _page_from_record can report them as before
+        assert _loads_without_text(b'{"title": "Python", "text": "x"}') == {
+            "title": "Python",
+            "text": "",
+        }
+
+        data_path = str(tmp_path / "wiki_01")
+        with open(data_path, "wb") as f:
+            f.write(line)
+        blob = zstandard.ZstdCompressor().compress(line)
+        entries = {
+            "bare": data_path.encode(),
+            "offsets": b"%s\x1f0\x1f%d" % (data_path.encode(), len(line)),
+            "embedded": data_path.encode() + b"\x1f" + blob,
+        }
+        for name, entry in entries.items():
+            db_path = str(tmp_path / f"{name}.lmdb")
+            write_test_index(db_path, {b"Python": entry})
+            wiki_data = WikiData(db_path, shard_index_cache_size=0)
+            with patch("src.wiki_db.orjson.loads") as loads:
+                page = wiki_data.get_page_light("Python")
+            loads.assert_not_called()
+            assert (page.title, page.content, page.links) == ("Python", "", ["A", "text"])
+
+    def test_get_page_with_embedded_page(self, tmp_path):
+        """Test that a page embedded in the index value is served without touching the file."""
+        db_path = str(tmp_path / "test.lmdb")
+        # The location is never opened, so it doesn't need to exist
+        data_path = str(tmp_path / "missing_wiki_01")
+        page_blob = zstandard.ZstdCompressor().compress(
+            json.dumps(
+                {"title": "Python", "url": "/wiki/Python", "text": "Snake", "links": ["A"]}
+            ).encode()
+        )
+
+        write_test_index(db_path, {b"Python": data_path.encode() + b"\x1f" + page_blob})
+
+        wiki_data = WikiData(db_path)
+
+        location, article = wiki_data.get_article_location("python")
+        assert location == data_path
+        assert article == "Python"
+
+        page = wiki_data.get_page("python")
+        assert page.title == "Python"
+        assert page.content == "Snake"
+        assert page.links == ["A"]
+
+    def test_get_page_with_line_offsets(self, tmp_path):
+        """Test that an index value with a byte span reads only that article's line."""
+        db_path = str(tmp_path / "test.lmdb")
+        data_path = str(tmp_path / "wiki_01")
+        # The first line is malformed, so a full-file scan would fail
+        first_line = b"not json\n"
+        line = json.dumps(
+            {"title": "Python", "url": "/wiki/Python", "text": "", "links": ["A"]}
+        ).encode() + b"\n"
+        with open(data_path, "wb") as f:
+            f.write(first_line + line)
+
+        write_test_index(
+            db_path,
+            {
+                b"Python": b"%s\x1f%d\x1f%d" % (data_path.encode(), len(first_line), len(line)),
+            },
+        )
+
+        wiki_data = WikiData(db_path)
+
+        location, article = wiki_data.get_article_location("python")
+        assert location == data_path
+        assert article == "Python"
+
+        page = wiki_data.get_page("python")
+        assert page.title == "Python"
+        assert page.links == ["A"]
+
+    @pytest.mark.parametrize(
+        "query, expected_location, expected_article",
+        [
+            # Exact matches, including whitespace-only titles
+            ("   ", "2025-06-01/WS/wiki_01", "   "),
+            ("\t\n", "2025-06-01/WS/wiki_02", "\t\n"),
+            # Capitalized first letter
+            ("machine learning", "2025-06-01/ML/wiki_02", "Machine learning"),
+            ("a", "2025-06-01/LETTER/wiki_A", "A"),
+            ("café", "2025-06-01/FR/wiki_01", "Café"),
+            # Lowercase
+            ("JAVASCRIPT", "2025-06-01/JS/wiki_01", "javascript"),
+            ("Html Css", "2025-06-01/WEB/wiki_02", "html css"),
+            ("X", "2025-06-01/LETTER/wiki_x", "x"),
+            ("МОСКВА", "2025-06-01/RU/wiki_01", "москва"),
+            # Uppercase
+            ("nasa", "2025-06-01/SPACE/wiki_01", "NASA"),
+            ("fbi cia", "2025-06-01/GOV/wiki_02", "FBI CIA"),
+            # Priority: an exact match wins, then capitalized, then lowercase, then uppercase
+            ("python", "2025-06-01/PY/lowercase", "python"),
+            ("PYTHON", "2025-06-01/PY/capitalized", "Python"),
+            ("Java", "2025-06-01/JAVA/lowercase", "java"),
+        ],
+    )
+    def test_case_fallback(
+        self, case_fallback_wiki_data, query, expected_location, expected_article
+    ):
+        """Test exact lookups and the case fallbacks tried when the exact title is missing."""
+        location, article = case_fallback_wiki_data.get_article_location(query)
+        assert location == expected_location
+        assert article == expected_article
+
+    @pytest.mark.parametrize("query", ["", "  ", "NonExistentArticle"])
+    def test_case_fallback_no_match_found(self, case_fallback_wiki_data, query):
+        """Test that ArticleNotFound is raised for empty names, different whitespace, and titles
+        with no matching case variation."""
+        from src.utils import ArticleNotFound
+
+        with pytest.raises(ArticleNotFound):
+            case_fallback_wiki_data.get_article_location(query)